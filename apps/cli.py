@@ -172,9 +172,23 @@ def _run_microgpt(args):
     """Run MicroGPT training and visualization."""
     log.info("Running MicroGPT...")
 
+    if getattr(args, 'sweep', False):
+        _run_microgpt_sweep()
+        return
+    if getattr(args, 'bench', False):
+        _run_microgpt_bench()
+        return
+
     from modules.microgpt.engine import MicroGPTVisualizer
     
-    viz = MicroGPTVisualizer()
+    viz = MicroGPTVisualizer(backend=getattr(args, 'backend', 'scalar'))
+    viz.resume = getattr(args, 'resume', False)
+    viz.write_checkpoint = getattr(args, 'checkpoint', False)
+    viz.profile = getattr(args, 'profile', False)
+    if getattr(args, 'time_budget', None):
+        viz.time_budget = args.time_budget
+    if getattr(args, 'cpu_budget', None):
+        viz.cpu_budget = args.cpu_budget
     viz.run()
     
     # Build & Deploy to update dashboard
@@ -182,6 +196,39 @@ def _run_microgpt(args):
         _build_and_deploy()
 
 
+def _run_microgpt_sweep():
+    """Train the microgpt.sweep grid in parallel and write data/microgpt/sweep.json."""
+    from modules.microgpt.sweep import run_sweep
+
+    cfg = Config.instance()
+    run_sweep(
+        cfg.get("microgpt.sweep.grid", {}),
+        backend=cfg.get("microgpt.sweep.backend", "numpy"),
+        workers=cfg.get("microgpt.sweep.workers", 0) or None,
+        seed=cfg.get("microgpt.sweep.seed", 0),
+        base_params=cfg.get("microgpt.sweep.params", {}),
+    )
+
+
+def _run_microgpt_bench():
+    """Benchmark the microgpt.bench matrix; exit 1 if a case regressed past the threshold."""
+    import sys
+
+    from modules.microgpt.bench import run_benchmark
+
+    cfg = Config.instance()
+    run = run_benchmark(
+        cfg.get("microgpt.bench.sizes", []),
+        backends=cfg.get("microgpt.bench.backends") or None,
+        steps=cfg.get("microgpt.bench.steps", 10),
+        warmup=cfg.get("microgpt.bench.warmup", 2),
+        seed=cfg.get("microgpt.bench.seed", 0),
+        threshold=cfg.get("microgpt.bench.threshold", 0.1),
+    )
+    if run['regressions']:
+        sys.exit(1)
+
+
 def _build(args=None):
     """Build the static site."""
     log.info("Building static site...")
@@ -365,8 +412,26 @@ def main():
     trader_parser.set_defaults(func=_run_trader)
 
     # run microgpt
+    from modules.microgpt.engine import BACKENDS
+
     microgpt_parser = run_sub.add_parser("microgpt", help="Run MicroGPT visualization")
     microgpt_parser.add_argument("--no-deploy", action="store_true", help="Skip build and deployment")
+    microgpt_parser.add_argument("--backend", choices=BACKENDS, default="scalar",
+                                 help="Autograd engine (numpy/compiled are much faster)")
+    microgpt_parser.add_argument("--resume", action="store_true",
+                                 help="Continue training from data/microgpt/checkpoint.npz and save back to it")
+    microgpt_parser.add_argument("--checkpoint", action="store_true",
+                                 help="Save data/microgpt/checkpoint.npz after a fresh run (implied by --resume)")
+    microgpt_parser.add_argument("--time-budget", type=float, metavar="SECONDS",
+                                 help="Train until this much wall-clock time is spent (overrides num_steps)")
+    microgpt_parser.add_argument("--cpu-budget", type=float, metavar="SECONDS",
+                                 help="Train until this much CPU time is spent (overrides num_steps)")
+    microgpt_parser.add_argument("--profile", action="store_true",
+                                 help="Record per-phase timings and op counts (trace.json, profile.folded)")
+    microgpt_parser.add_argument("--sweep", action="store_true",
+                                 help="Train the microgpt.sweep grid in parallel (writes sweep.json, no deploy)")
+    microgpt_parser.add_argument("--bench", action="store_true",
+                                 help="Benchmark the microgpt.bench matrix (appends to bench.json, no deploy)")
     microgpt_parser.set_defaults(func=_run_microgpt)
 
     # --- build ---
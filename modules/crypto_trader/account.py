@@ -0,0 +1,93 @@
+"""
+Account Snapshot
+- One ``get_balances()`` call and one batched price request (``PriceService``)
+  describe the whole account for a trading cycle.
+- Balance info, held-coin count, total equity and the status positions are
+  all read from the snapshot instead of querying Upbit per ticker.
+- ``CryptoEngine`` refreshes it once per cycle and after each order.
+"""
+
+import time
+
+MIN_POSITION_VALUE = 5000  # KRW; smaller holdings are dust, not positions
+
+
+class AccountSnapshot:
+    """
+    Balances and prices at ``taken_at``. ``balances`` maps currency to
+    ``{'balance', 'avg_buy_price'}``; ``prices`` maps ``KRW-<currency>`` to
+    its current price (KRW itself is worth 1).
+    """
+
+    def __init__(self, balances, prices, taken_at=None):
+        self.balances = balances
+        self.prices = prices
+        self.taken_at = taken_at or time.time()
+
+    @classmethod
+    def fetch(cls, upbit, prices, watch=()):
+        """
+        Reads the account from Upbit, pricing held currencies through the
+        ``PriceService`` ``prices``. The ``watch`` tickers are priced in the
+        same request, so the cycle's later lookups hit the cache. Raises
+        ValueError on an unexpected response (e.g. an auth error payload).
+        """
+        raw = upbit.get_balances()
+        if not isinstance(raw, list) or (raw and not isinstance(raw[0], dict)):
+            raise ValueError(f"unexpected get_balances response: {raw!r}"[:200])
+        balances = {
+            b['currency']: {'balance': float(b['balance']), 'avg_buy_price': float(b['avg_buy_price'])}
+            for b in raw if isinstance(b, dict)
+        }
+        held = [f"KRW-{currency}" for currency in balances if currency != 'KRW']
+        return cls(balances, prices.get_prices(held + list(watch)))
+
+    @classmethod
+    def simulated(cls, krw=1000000):
+        return cls({'KRW': {'balance': krw, 'avg_buy_price': 0}}, {})
+
+    def price(self, currency):
+        return 1 if currency == 'KRW' else self.prices.get(f"KRW-{currency}")
+
+    @property
+    def krw_balance(self):
+        return self.balances.get('KRW', {}).get('balance', 0)
+
+    def balance_info(self, ticker):
+        """The ``{'krw_balance', 'coin_balance', 'avg_buy_price'}`` dict the trading logic works with."""
+        coin = self.balances.get(ticker.split('-')[1], {})
+        return {
+            'krw_balance': self.krw_balance,
+            'coin_balance': coin.get('balance', 0),
+            'avg_buy_price': coin.get('avg_buy_price', 0),
+        }
+
+    def value(self, currency):
+        """KRW value of a holding, or None if its price is unknown."""
+        price = self.price(currency)
+        return self.balances[currency]['balance'] * price if price else None
+
+    @property
+    def total_assets(self):
+        return sum(self.value(currency) or 0 for currency in self.balances)
+
+    def held_coin_count(self):
+        """Coins (not KRW) held for more than ``MIN_POSITION_VALUE``."""
+        return sum(1 for currency in self.balances
+                   if currency != 'KRW' and (self.value(currency) or 0) > MIN_POSITION_VALUE)
+
+    def positions(self):
+        """Per-currency balance, value, average buy price and return rate (%) for ``status.json``."""
+        positions = {}
+        for currency, b in self.balances.items():
+            price, value = self.price(currency), self.value(currency)
+            if value is None:
+                continue
+            avg_buy_price = b['avg_buy_price']
+            positions[currency] = {
+                'balance': b['balance'],
+                'value': value,
+                'avg_buy_price': avg_buy_price,
+                'return_rate': (price - avg_buy_price) / avg_buy_price * 100 if avg_buy_price > 0 else 0,
+            }
+        return positions
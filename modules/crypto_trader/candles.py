@@ -0,0 +1,193 @@
+"""
+OHLCV Candle Store
+- Persists Upbit minute candles in SQLite (``data/trade/candles.sqlite``),
+  one row per (ticker, interval, candle start).
+- Each update downloads only the candles since the last stored one (that
+  one included, as it may have been stored while still forming), instead
+  of the full 240-candle window every cycle.
+- Holes inside the served window are re-requested once; slots Upbit still
+  has no candle for (no trades) are remembered and not asked for again.
+- If the update download fails and nothing is stored for the current slot,
+  no data is served rather than an outdated window.
+- Kept history accumulates across cycles for backtests.
+- Also keeps each ticker's streaming ``IndicatorState`` and the indicator
+  values of closed candles, so indicators are only computed for new ones.
+"""
+
+import contextlib
+import json
+import math
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pyupbit
+
+from core.config import PROJECT_ROOT
+from core.logger import get_logger
+
+from .indicators import INDICATORS, IndicatorState
+
+log = get_logger("crypto_trader.candles")
+
+CANDLE_DB = PROJECT_ROOT / "data" / "trade" / "candles.sqlite"
+COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'value')
+KST = timezone(timedelta(hours=9))  # Upbit candle times; no DST
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candles (
+    ticker TEXT NOT NULL, interval TEXT NOT NULL, ts INTEGER NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL, value REAL,
+    PRIMARY KEY (ticker, interval, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS indicators (
+    ticker TEXT NOT NULL, interval TEXT NOT NULL, ts INTEGER NOT NULL,
+    ma5 REAL, ma20 REAL, ma60 REAL, bb_upper REAL, bb_lower REAL, bb_mid REAL, macd REAL, macd_signal REAL, rsi REAL,
+    PRIMARY KEY (ticker, interval, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS indicator_state (
+    ticker TEXT NOT NULL, interval TEXT NOT NULL, ts INTEGER NOT NULL, state TEXT NOT NULL,
+    PRIMARY KEY (ticker, interval)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS empty_slots (
+    ticker TEXT NOT NULL, interval TEXT NOT NULL, ts INTEGER NOT NULL,
+    PRIMARY KEY (ticker, interval, ts)
+) WITHOUT ROWID;
+"""
+
+
+def _ts(dt):
+    """Naive KST candle time -> integer seconds (KST wall clock read as UTC, so slots are multiples of the step)."""
+    return int(dt.replace(tzinfo=timezone.utc).timestamp())
+
+
+def _utc_str(ts):
+    """Candle-start seconds -> the naive UTC string Upbit's ``to`` parameter expects (exclusive)."""
+    return (datetime.fromtimestamp(ts, timezone.utc) - timedelta(hours=9)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class CandleStore:
+    """
+    ``get_ohlcv(ticker, interval, minutes, count)`` is a drop-in for
+    ``pyupbit.get_ohlcv`` on minute intervals. ``fetch`` (default
+    ``pyupbit.get_ohlcv``) is called with the same arguments; ``downloaded``
+    counts candles received from it.
+    """
+
+    def __init__(self, path=CANDLE_DB, fetch=None):
+        self.path = path
+        self.fetch = fetch or (lambda *args, **kwargs: pyupbit.get_ohlcv(*args, **kwargs))
+        self.downloaded = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One short-lived connection per call: callers fetch tickers from several threads
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:  # commits, or rolls back on error
+                yield db
+        finally:
+            db.close()
+
+    def get_ohlcv(self, ticker, interval, minutes, count=240, now=None):
+        """Updates ``ticker`` and returns its latest ``count`` candles, or None if there are none or they are stale."""
+        if not self.update(ticker, interval, minutes, count, now):
+            return None
+        df = self.load(ticker, interval, count)
+        return df if len(df) else None
+
+    def update(self, ticker, interval, minutes, count=240, now=None):
+        """
+        Fetches the candles since the last stored one, then repairs holes in
+        the latest ``count`` slots. Returns False if the download failed while
+        the stored candles end before the current slot (they are outdated).
+        """
+        step = minutes * 60
+        now = now or datetime.now(KST).replace(tzinfo=None)
+        latest = _ts(now) // step * step  # start of the candle forming now
+        with self._connect() as db:
+            last = db.execute("SELECT MAX(ts) FROM candles WHERE ticker = ? AND interval = ?",
+                              (ticker, interval)).fetchone()[0]
+
+        missing = count if last is None else min((latest - last) // step + 1, count)
+        if not self._store(ticker, interval, self.fetch(ticker, interval=interval, count=missing)) and \
+                (last is None or last < latest):
+            log.warning(f"No {interval} candles received for {ticker}; stored ones are outdated")
+            return False
+        self._repair(ticker, interval, step, latest - (count - 1) * step)
+        return True
+
+    def load(self, ticker, interval, count=240):
+        """The latest ``count`` stored candles as a DataFrame indexed by naive KST candle start."""
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT ts, {', '.join(COLUMNS)} FROM candles WHERE ticker = ? AND interval = ? "
+                "ORDER BY ts DESC LIMIT ?", (ticker, interval, count)).fetchall()
+        # One float64 block, wrapped by the DataFrame as-is
+        data = np.array(rows[::-1], dtype=np.float64).reshape(-1, len(COLUMNS) + 1)
+        index = pd.to_datetime(data[:, 0].astype(np.int64), unit='s')
+        return pd.DataFrame(data[:, 1:], index=index, columns=list(COLUMNS), copy=False)
+
+    def _store(self, ticker, interval, df):
+        if df is None or df.empty:
+            return 0
+        self.downloaded += len(df)
+        rows = [(ticker, interval, _ts(dt), *(float(row[c]) for c in COLUMNS))
+                for dt, row in zip(df.index.to_pydatetime(), df.to_dict('records'))]
+        with self._connect() as db:
+            db.executemany(f"INSERT OR REPLACE INTO candles VALUES (?, ?, ?, {', '.join('?' * len(COLUMNS))})", rows)
+        return len(rows)
+
+    def _repair(self, ticker, interval, step, since):
+        with self._connect() as db:
+            stored = [ts for (ts,) in db.execute(
+                "SELECT ts FROM candles WHERE ticker = ? AND interval = ? AND ts >= ? "
+                "UNION SELECT ts FROM empty_slots WHERE ticker = ? AND interval = ? AND ts >= ? ORDER BY ts",
+                (ticker, interval, since, ticker, interval, since))]
+
+        for a, b in zip(stored, stored[1:]):
+            if b - a <= step:
+                continue
+            slots = range(a + step, b, step)
+            log.info(f"Repairing {len(slots)} missing {interval} candles of {ticker}")
+            df = self.fetch(ticker, interval=interval, count=len(slots), to=_utc_str(b))
+            if df is None:  # request failed; retry next update
+                continue
+            self._store(ticker, interval, df)
+            with self._connect() as db:
+                # Whatever is still missing had no trades; do not ask again
+                db.executemany("INSERT OR IGNORE INTO empty_slots VALUES (?, ?, ?)",
+                               [(ticker, interval, ts) for ts in slots if not db.execute(
+                                   "SELECT 1 FROM candles WHERE ticker = ? AND interval = ? AND ts = ?",
+                                   (ticker, interval, ts)).fetchone()])
+
+    def load_indicator_state(self, ticker, interval):
+        """``(ts, IndicatorState)`` as of the last committed candle, or ``(None, None)``."""
+        with self._connect() as db:
+            row = db.execute("SELECT ts, state FROM indicator_state WHERE ticker = ? AND interval = ?",
+                             (ticker, interval)).fetchone()
+        return (row[0], IndicatorState.from_dict(json.loads(row[1]))) if row else (None, None)
+
+    def save_indicators(self, ticker, interval, ts, state, rows):
+        """Stores ``state`` as of candle ``ts`` and the ``(ts, values)`` of the candles it just committed."""
+        def sql(v):
+            return None if math.isnan(v) else v  # NULL in SQLite, NaN again when loaded
+
+        with self._connect() as db:
+            db.executemany(f"INSERT OR REPLACE INTO indicators VALUES (?, ?, ?, {', '.join('?' * len(INDICATORS))})",
+                           [(ticker, interval, t, *(sql(v[k]) for k in INDICATORS)) for t, v in rows])
+            db.execute("INSERT OR REPLACE INTO indicator_state VALUES (?, ?, ?, ?)",
+                       (ticker, interval, ts, json.dumps(state.to_dict())))
+
+    def load_indicators(self, ticker, interval, since, until):
+        """``{ts: row}`` of stored indicator values for candles ``since..until``, rows in ``INDICATORS`` order."""
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT ts, {', '.join(INDICATORS)} FROM indicators "
+                "WHERE ticker = ? AND interval = ? AND ts BETWEEN ? AND ?", (ticker, interval, since, until))
+            return {row[0]: row[1:] for row in rows}
@@ -15,6 +15,12 @@ from google import genai
 from core.config import PROJECT_ROOT, Config
 from core.logger import get_logger
 
+from .account import AccountSnapshot
+from .candles import CandleStore
+from .fetch import fetch_all
+from .indicators import add_streaming_indicators, compute_indicators
+from .prices import PriceService
+
 log = get_logger("crypto_trader.engine")
 STATUS_FILE = PROJECT_ROOT / "data" / "trade" / "status.json"
 
@@ -59,6 +65,22 @@ class CryptoEngine:
         self.interval = self.cfg.get("crypto_trader.interval_minutes", 15)
         self.interval_str = f"minute{self.interval}"  # Dynamically use interval from config
 
+        # Fetch Config (market data is gathered concurrently, see fetch_market_snapshot)
+        self.fetch_workers = self.cfg.get("crypto_trader.fetch.workers", 8)
+        self.fetch_timeout = self.cfg.get("crypto_trader.fetch.timeout", 10)
+
+        # Local candle store: each cycle downloads only the newest candles
+        self.candles = None
+        if self.cfg.get("crypto_trader.candles.enabled", True):
+            self.candles = CandleStore()
+
+        # Current prices, batched and cached briefly across the cycle's lookups
+        self.prices = PriceService(ttl=self.cfg.get("crypto_trader.price_ttl", 10))
+
+        # Account state, read once per cycle and after each order (see refresh_account)
+        self.account = None
+        self.order_settle_seconds = 0.5  # lets Upbit apply a market order before the account is re-read
+
         # Capital Config
         self.max_coins_held = self.cfg.get("crypto_trader.capital.max_coins_held", 3)
         self.investment_per_trade_pct = self.cfg.get("crypto_trader.capital.investment_per_trade", 0.3)
@@ -73,38 +95,52 @@ class CryptoEngine:
         """Fetches OHLCV and technical indicators."""
         try:
             # Fetching 240 (10 days) to ensure enough buffer for MA60
-            df = pyupbit.get_ohlcv(ticker, interval=self.interval_str, count=240)
+            if self.candles:
+                df = self.candles.get_ohlcv(ticker, self.interval_str, self.interval, count=240)
+            else:
+                df = pyupbit.get_ohlcv(ticker, interval=self.interval_str, count=240)
             if df is None or df.empty:
                 return None
 
-            # 1. Moving Averages
-            df['ma5'] = df['close'].rolling(window=5).mean()
-            df['ma20'] = df['close'].rolling(window=20).mean()
-            df['ma60'] = df['close'].rolling(window=60).mean()
-
-            # 2. Bollinger Bands (20, 2)
-            std20 = df['close'].rolling(window=20).std()
-            df['bb_upper'] = df['ma20'] + (std20 * 2)
-            df['bb_lower'] = df['ma20'] - (std20 * 2)
-            df['bb_mid'] = df['ma20']
-
-            # 3. MACD (12, 26, 9)
-            exp12 = df['close'].ewm(span=12, adjust=False).mean()
-            exp26 = df['close'].ewm(span=26, adjust=False).mean()
-            df['macd'] = exp12 - exp26
-            df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-
-            # 4. RSI (14)
-            delta = df['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            df['rsi'] = 100 - (100 / (1 + rs))
-            return df
+            # MA5/20/60, Bollinger (20, 2), MACD (12, 26, 9), RSI (14)
+            if self.candles:
+                # Streaming: only candles closed since the last cycle are computed
+                return add_streaming_indicators(df, self.candles, ticker, self.interval_str)
+            return compute_indicators(df)
         except Exception as e:
             log.error(f"Error fetching market data for {ticker}: {e}")
             return None
 
+    def fetch_market_snapshot(self):
+        """
+        Fetches OHLCV for every configured coin concurrently and adds its
+        current price (one batched request) and balance info from the
+        account snapshot.
+        Returns ``{ticker: {'df', 'current_price', 'balance_info'}}`` in
+        config order, only for coins whose data all arrived, so the whole
+        cycle decides on one consistent snapshot.
+        """
+        jobs = {}
+        for ticker in self.coins:
+            jobs[ticker] = lambda t=ticker: self.get_market_data(t)
+
+        t0 = time.perf_counter()
+        results = fetch_all(jobs, workers=self.fetch_workers, timeout=self.fetch_timeout)
+        prices = self.prices.get_prices(self.coins)
+        snapshot = {}
+        for ticker in self.coins:
+            data = {
+                'df': results.get(ticker),
+                'current_price': prices.get(ticker),
+                'balance_info': self.get_balance_info(ticker),
+            }
+            if any(value is None for value in data.values()):
+                log.warning(f"Incomplete market data for {ticker}. Skip this cycle.")
+                continue
+            snapshot[ticker] = data
+        log.info(f"📡 Fetched {len(snapshot)}/{len(self.coins)} coins in {time.perf_counter() - t0:.1f}s")
+        return snapshot
+
     def analyze_market(self, ticker, df, balance_info, total_assets):
         """Analyzes market data using AI and returns a trading decision."""
         if not self.model:
@@ -256,55 +292,47 @@ class CryptoEngine:
                 reason_kr = decision.get('reason_kr', '이유 불명')
                 log.info(f"🚀 BUY {ticker} | Size: {amount_to_invest:,.0f} KRW | Reason: {reason_kr}")
                 self.upbit.buy_market_order(ticker, amount_to_invest)
+                self.refresh_account(settle=True)
 
             elif action == 'SELL':
                 if balance_info['coin_balance'] * current_price > 5000:
                     reason_kr = decision.get('reason_kr', '이유 불명')
                     log.info(f"📉 SELL {ticker} | Reason: {reason_kr}")
                     self.upbit.sell_market_order(ticker, balance_info['coin_balance'])
+                    self.refresh_account(settle=True)
 
         except Exception as e:
             log.error(f"Trade Execution Error: {e}")
 
+    def refresh_account(self, settle=False):
+        """
+        Re-reads balances and prices into ``self.account`` (two API calls).
+        ``settle`` waits ``order_settle_seconds`` first, for use right after
+        an order. Keeps the previous snapshot if the refresh fails.
+        """
+        if not self.upbit:
+            self.account = AccountSnapshot.simulated()
+            return self.account
+        if settle:
+            time.sleep(self.order_settle_seconds)
+        try:
+            self.account = AccountSnapshot.fetch(self.upbit, self.prices, watch=self.coins)
+        except Exception as e:
+            log.warning(f"Error refreshing account: {e}")
+        return self.account
+
+    def _account(self):
+        return self.account or self.refresh_account() or AccountSnapshot.simulated(0)
+
     def get_held_coin_count(self):
         """Returns number of coins currently held (value > 5000 KRW)."""
         if not self.upbit:
             return 0
-        try:
-            balances = self.upbit.get_balances()
-            count = 0
-            for b in balances:
-                if b['currency'] == 'KRW':
-                    continue
-
-                current_price = pyupbit.get_current_price(f"KRW-{b['currency']}")
-                if current_price and (float(b['balance']) * current_price) > 5000:
-                    count += 1
-            return count
-        except Exception:
-            return 0
+        return self._account().held_coin_count()
 
     def get_balance_info(self, ticker):
         """Helper to get balance info for a specific ticker."""
-        info = {'krw_balance': 0, 'coin_balance': 0, 'avg_buy_price': 0}
-        if self.upbit:
-            info['krw_balance'] = self.upbit.get_balance("KRW")
-            info['coin_balance'] = self.upbit.get_balance(ticker)
-            # Need to get avg_buy_price from full balance list
-            try:
-                balances = self.upbit.get_balances()
-                if isinstance(balances, list):
-                    currency = ticker.split('-')[1]
-                    for b in balances:
-                        if isinstance(b, dict) and b['currency'] == currency:
-                            info['avg_buy_price'] = float(b['avg_buy_price'])
-                            break
-            except Exception as e:
-                log.warning(f"Error getting balance info: {e}")
-        else:
-            # Simulation defaults
-            info['krw_balance'] = 1000000
-        return info
+        return self._account().balance_info(ticker)
 
     def save_status(self, trade_results):
         """Saves current status to JSON, maintaining a history of trades."""
@@ -317,42 +345,10 @@ class CryptoEngine:
             except Exception as e:
                 log.error(f"Failed to load existing status from {STATUS_FILE}: {e}")
 
-        # Get total assets
-        total_assets = 0
-        balances = {}
-
-        if self.upbit:
-            try:
-                balances_raw = self.upbit.get_balances()
-                if isinstance(balances_raw, list):
-                    for b in balances_raw:
-                        if not isinstance(b, dict):
-                            continue
-                        currency = b['currency']
-                        balance = float(b['balance'])
-                        avg_buy_price = float(b['avg_buy_price'])
-                        current_price = 1 if currency == 'KRW' else pyupbit.get_current_price(f"KRW-{currency}")
-
-                        if current_price:
-                            value = balance * current_price
-                            total_assets += value
-
-                            return_rate = 0
-                            if avg_buy_price > 0:
-                                return_rate = (current_price - avg_buy_price) / avg_buy_price * 100
-
-                            balances[currency] = {
-                                'balance': balance,
-                                'value': value,
-                                'avg_buy_price': avg_buy_price,
-                                'return_rate': return_rate
-                            }
-            except Exception as e:
-                log.warning(f"Error calculating assets: {e}")
-        else:
-             # Mock data for simulation
-             total_assets = 1000000
-             balances = {'KRW': {'balance': 1000000, 'value': 1000000}}
+        # Get total assets (the account is current: it is re-read after every order)
+        account = self._account()
+        total_assets = account.total_assets
+        balances = account.positions()
 
         # Update Trade History
         recent_trades = existing_data.get('recent_trades', [])
@@ -382,43 +378,27 @@ class CryptoEngine:
 
         # 1. Analyze ALL Coins
         analysis_results = []
-        total_assets = 0
 
-        # Calculate Total Capital
+        # Calculate Total Capital (one account snapshot for the whole cycle)
         if self.upbit:
              try:
-                 balances = self.upbit.get_balances()
-                 if not isinstance(balances, list) or (balances and not isinstance(balances[0], dict)):
-                     log.error("⚠️ Upbit API returned unexpected response. Falling back to simulation.")
-                     self.upbit = None
-                     total_assets = 0
-                 else:
-                     for b in balances:
-                         if b['currency'] == 'KRW':
-                             total_assets += float(b['balance'])
-                         else:
-                             ticker = f"KRW-{b['currency']}"
-                             current_price = pyupbit.get_current_price(ticker)
-                             if current_price:
-                                total_assets += float(b['balance']) * current_price
+                 self.account = AccountSnapshot.fetch(self.upbit, self.prices, watch=self.coins)
+             except ValueError as e:
+                 log.error(f"⚠️ Upbit API returned unexpected response. Falling back to simulation. ({e})")
+                 self.upbit = None
              except Exception as e:
                  log.error(f"Error checking balances: {e}")
                  self.upbit = None
-                 total_assets = 0
 
         if not self.upbit:
-            total_assets = 1000000 # Sim
+            self.account = AccountSnapshot.simulated()
+        total_assets = self.account.total_assets
 
         log.info(f"💰 Total Equity: {total_assets:,.0f} KRW")
 
-        for ticker in self.coins:
-            # Get Market Data
-            df = self.get_market_data(ticker)
-            if df is None:
-                continue
-
-            current_price = pyupbit.get_current_price(ticker)
-            balance_info = self.get_balance_info(ticker)
+        snapshot = self.fetch_market_snapshot()
+        for ticker, data in snapshot.items():
+            df, current_price, balance_info = data['df'], data['current_price'], data['balance_info']
 
             # AI Analysis
             decision = self.analyze_market(ticker, df, balance_info, total_assets)
@@ -457,7 +437,7 @@ class CryptoEngine:
             # Upbit updates balance instantly after self.execute_trade, but here we estimate
             # Or we can just try to execute and let execute_trade handle Insufficient KRW.
             # But for SWAPPING, we need to know if we are out of cash.
-            current_krw = self.get_balance_info(item['ticker'])['krw_balance'] if self.upbit else 1000000
+            current_krw = self._account().krw_balance
 
             if current_slots < self.max_coins_held and current_krw >= 5000:
                 log.info(f"🚀 Executing Ranked BUY for {item['ticker']} "
@@ -501,10 +481,7 @@ class CryptoEngine:
                             weakest_coin['balance_info'], weakest_coin['total_assets']
                         )
                         
-                        # Wait a bit for Upbit balance to update
-                        time.sleep(0.5)
-                        
-                        # 2. Re-fetch current info for the new buy to ensure updated KRW balance
+                        # 2. The sell refreshed the account: read the updated KRW balance for the new buy
                         updated_balance_info = self.get_balance_info(item['ticker'])
                         
                         # 3. Buy Strong Coin
@@ -533,3 +510,5 @@ class CryptoEngine:
             })
 
         self.save_status(final_results)
+        stats = self.prices.stats()
+        log.info(f"💱 Prices: {stats['requests']} requests, {stats['hits']} cache hits / {stats['misses']} misses")
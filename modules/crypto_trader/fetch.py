@@ -0,0 +1,66 @@
+"""
+Concurrent Market Data Fetch
+- Fans independent blocking Upbit calls out over a bounded thread pool, so
+  a cycle's fetch latency follows the slowest request instead of the sum.
+- pyupbit exposes no request timeout, so each call gets a deadline counted
+  from when it starts running; a call past its deadline is abandoned (its
+  thread finishes in the background) and its result left out.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from core.logger import get_logger
+
+log = get_logger("crypto_trader.fetch")
+
+
+def fetch_all(jobs, workers=8, timeout=10.0):
+    """
+    Runs ``jobs`` (``{key: zero-arg callable}``) on at most ``workers``
+    threads and returns ``{key: result}`` for the calls that finished in
+    time. Calls that raise or exceed ``timeout`` seconds are logged and
+    missing from the result.
+    """
+    if not jobs:
+        return {}
+
+    started = {}
+
+    def run(key, fn):
+        started[key] = time.monotonic()
+        return fn()
+
+    workers = min(workers, len(jobs))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upbit-fetch")
+    futures = {pool.submit(run, key, fn): key for key, fn in jobs.items()}
+    pending = set(futures)
+    abandoned = []
+    results = {}
+    try:
+        while pending:
+            now = time.monotonic()
+            deadlines = [started[futures[f]] + timeout for f in pending if futures[f] in started]
+            done, pending = wait(pending, timeout=max(min(deadlines) - now, 0) if deadlines else timeout,
+                                 return_when=FIRST_COMPLETED)
+            for f in done:
+                try:
+                    results[futures[f]] = f.result()
+                except Exception as e:
+                    log.error(f"Fetch {futures[f]} failed: {e}")
+
+            now = time.monotonic()
+            expired = {f for f in pending if futures[f] in started and now - started[futures[f]] >= timeout}
+            for f in expired:
+                log.warning(f"Fetch {futures[f]} timed out after {timeout}s")
+            pending -= expired
+            abandoned.extend(expired)
+
+            # Every worker is stuck in an abandoned call: queued jobs would never start
+            if pending and sum(not f.done() for f in abandoned) >= workers and \
+                    not any(futures[f] in started for f in pending):
+                log.warning(f"Fetch pool exhausted by timed-out calls; skipping {len(pending)} queued jobs")
+                break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
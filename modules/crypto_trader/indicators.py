@@ -0,0 +1,221 @@
+"""
+Technical Indicators
+- ``compute_indicators``: the pandas reference path over a whole OHLCV
+  frame (MA5/20/60, Bollinger 20/2, MACD 12/26/9, RSI14).
+- ``IndicatorState``: the same indicators updated in O(1) per closed candle
+  from running window sums and EMAs. Its state is a small JSON-able dict, so
+  it carries over between cycles and the cost per cycle no longer grows
+  with the lookback length.
+"""
+
+import collections
+import copy
+import math
+
+import numpy as np
+
+INDICATORS = ('ma5', 'ma20', 'ma60', 'bb_upper', 'bb_lower', 'bb_mid', 'macd', 'macd_signal', 'rsi')
+
+
+def compute_indicators(df):
+    """Adds the indicator columns to ``df`` (in place) from its ``close`` column and returns it."""
+    # 1. Moving Averages
+    df['ma5'] = df['close'].rolling(window=5).mean()
+    df['ma20'] = df['close'].rolling(window=20).mean()
+    df['ma60'] = df['close'].rolling(window=60).mean()
+
+    # 2. Bollinger Bands (20, 2)
+    std20 = df['close'].rolling(window=20).std()
+    df['bb_upper'] = df['ma20'] + (std20 * 2)
+    df['bb_lower'] = df['ma20'] - (std20 * 2)
+    df['bb_mid'] = df['ma20']
+
+    # 3. MACD (12, 26, 9)
+    exp12 = df['close'].ewm(span=12, adjust=False).mean()
+    exp26 = df['close'].ewm(span=26, adjust=False).mean()
+    df['macd'] = exp12 - exp26
+    df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
+
+    # 4. RSI (14)
+    delta = df['close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    df['rsi'] = 100 - (100 / (1 + rs))
+    return df
+
+
+def _ema(prev, x, span):
+    """One ``ewm(span, adjust=False)`` step; the first value seeds the average."""
+    if prev is None:
+        return x
+    alpha = 2 / (span + 1)
+    return alpha * x + (1 - alpha) * prev
+
+
+class IndicatorState:
+    """
+    Running state over the closes seen so far. ``update(close)`` commits a
+    closed candle and returns its indicator values (NaN until a window is
+    full, like pandas); ``peek(close)`` evaluates a still-forming candle
+    without committing it.
+    """
+
+    RESYNC = 60  # recompute the window sums exactly every RESYNC updates, bounding float drift
+
+    def __init__(self):
+        self.count = 0
+        self.closes = collections.deque(maxlen=60)
+        self.sums = {5: 0.0, 20: 0.0, 60: 0.0}
+        # Sums of (close - ref) over the last 20: the variance without cancelling huge squares
+        self.ref = None
+        self.dev20 = self.devsq20 = 0.0
+        self.ema12 = self.ema26 = self.signal = None
+        self.prev_close = None
+        self.deltas = collections.deque(maxlen=14)
+        self.gain_sum = self.loss_sum = 0.0
+
+    def update(self, close):
+        close = float(close)
+        # Rolling sums: add the new close, drop the one leaving each window
+        for window in self.sums:
+            self.sums[window] += close
+            if len(self.closes) >= window:
+                self.sums[window] -= self.closes[-window]
+        if self.ref is None:
+            self.ref = close
+        d = close - self.ref
+        self.dev20 += d
+        self.devsq20 += d * d
+        if len(self.closes) >= 20:
+            old = self.closes[-20] - self.ref
+            self.dev20 -= old
+            self.devsq20 -= old * old
+        self.closes.append(close)
+
+        self.ema12 = _ema(self.ema12, close, 12)
+        self.ema26 = _ema(self.ema26, close, 26)
+        self.signal = _ema(self.signal, self.ema12 - self.ema26, 9)
+
+        # The first close counts as a zero move, as ``where`` turns pandas' leading NaN diff into 0
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        if len(self.deltas) == self.deltas.maxlen:
+            self.gain_sum -= max(self.deltas[0], 0.0)
+            self.loss_sum -= max(-self.deltas[0], 0.0)
+        self.deltas.append(delta)
+        self.gain_sum += max(delta, 0.0)
+        self.loss_sum += max(-delta, 0.0)
+        self.prev_close = close
+
+        self.count += 1
+        if self.count % self.RESYNC == 0:
+            self._resync()
+        return self.values()
+
+    def _resync(self):
+        closes = list(self.closes)
+        self.sums = {w: math.fsum(closes[-w:]) for w in self.sums}
+        self.ref = closes[-1]
+        self.dev20 = math.fsum(x - self.ref for x in closes[-20:])
+        self.devsq20 = math.fsum((x - self.ref) ** 2 for x in closes[-20:])
+        self.gain_sum = math.fsum(max(d, 0.0) for d in self.deltas)
+        self.loss_sum = math.fsum(max(-d, 0.0) for d in self.deltas)
+
+    def peek(self, close):
+        return copy.deepcopy(self).update(close)
+
+    def values(self):
+        n = len(self.closes)
+        ma = {w: self.sums[w] / w if n >= w else math.nan for w in self.sums}
+        std20 = math.nan
+        if n >= 20:
+            # Sample variance (ddof=1), clamped: cancellation can leave a tiny negative
+            std20 = math.sqrt(max((self.devsq20 - self.dev20 ** 2 / 20) / 19, 0.0))
+
+        rsi = math.nan
+        if len(self.deltas) == self.deltas.maxlen:
+            # A window without down (up) moves has exactly zero loss (gain), whatever the running sum says
+            gain = self.gain_sum / 14 if any(d > 0 for d in self.deltas) else 0.0
+            loss = self.loss_sum / 14 if any(d < 0 for d in self.deltas) else 0.0
+            if loss > 0:
+                rsi = 100 - 100 / (1 + gain / loss)
+            elif gain > 0:
+                rsi = 100.0
+
+        macd = math.nan if self.ema12 is None else self.ema12 - self.ema26
+        return {
+            'ma5': ma[5],
+            'ma20': ma[20],
+            'ma60': ma[60],
+            'bb_upper': ma[20] + std20 * 2,
+            'bb_lower': ma[20] - std20 * 2,
+            'bb_mid': ma[20],
+            'macd': macd,
+            'macd_signal': math.nan if self.signal is None else self.signal,
+            'rsi': rsi,
+        }
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'closes': list(self.closes),
+            'sums': {str(w): s for w, s in self.sums.items()},
+            'ref': self.ref,
+            'dev20': self.dev20,
+            'devsq20': self.devsq20,
+            'ema12': self.ema12,
+            'ema26': self.ema26,
+            'signal': self.signal,
+            'prev_close': self.prev_close,
+            'deltas': list(self.deltas),
+            'gain_sum': self.gain_sum,
+            'loss_sum': self.loss_sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.count = data['count']
+        state.closes.extend(data['closes'])
+        state.sums = {int(w): s for w, s in data['sums'].items()}
+        state.ref, state.dev20, state.devsq20 = data['ref'], data['dev20'], data['devsq20']
+        state.ema12, state.ema26, state.signal = data['ema12'], data['ema26'], data['signal']
+        state.prev_close = data['prev_close']
+        state.deltas.extend(data['deltas'])
+        state.gain_sum, state.loss_sum = data['gain_sum'], data['loss_sum']
+        return state
+
+
+def add_streaming_indicators(df, store, ticker, interval):
+    """
+    Adds the indicator columns to a candle-store frame (in place) from the
+    ticker's persisted ``IndicatorState``. Closed candles (all but the last
+    row, which may still be forming) newer than the state are committed and
+    stored; the last row is peeked. If the state does not connect to the
+    frame (first run, or longer downtime than the frame), it is rebuilt over
+    the frame, which is then exactly the pandas computation.
+    """
+    ts = df.index.to_numpy().astype('datetime64[s]').astype(np.int64).tolist()
+    closes = df['close'].tolist()
+    closed = ts[:-1]
+
+    state_ts, state = store.load_indicator_state(ticker, interval)
+    if state is None or state_ts not in closed:
+        state, start = IndicatorState(), 0
+    else:
+        start = closed.index(state_ts) + 1
+
+    committed = [(t, state.update(c)) for t, c in zip(closed[start:], closes[start:-1])]
+    if committed:
+        store.save_indicators(ticker, interval, committed[-1][0], state, committed)
+
+    stored = store.load_indicators(ticker, interval, ts[0], ts[-1]) if closed else {}
+    values = np.full((len(ts), len(INDICATORS)), np.nan)
+    for i, t in enumerate(closed):
+        if t in stored:
+            values[i] = np.array(stored[t], dtype=np.float64)
+    last = state.peek(closes[-1])
+    values[-1] = [last[k] for k in INDICATORS]
+    for j, name in enumerate(INDICATORS):
+        df[name] = values[:, j]
+    return df
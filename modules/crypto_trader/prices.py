@@ -0,0 +1,91 @@
+"""
+Price Service
+- Current prices for many markets in one batched ``get_current_price``
+  request (the ticker endpoint accepts a list of markets).
+- Prices are cached in memory for ``ttl`` seconds, so repeated lookups in a
+  cycle (equity, balance checks, per-coin decisions) cost no extra request.
+- ``hits`` / ``misses`` count cached vs fetched lookups, ``requests`` the
+  HTTP calls made.
+"""
+
+import threading
+import time
+
+import pyupbit
+
+from core.logger import get_logger
+
+log = get_logger("crypto_trader.prices")
+
+
+class PriceService:
+
+    def __init__(self, ttl=10.0, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+        self._cache = {}  # ticker -> (price, fetched_at)
+        self._lock = threading.Lock()
+
+    def get_prices(self, tickers):
+        """
+        ``{ticker: price}`` for ``tickers``; stale or missing ones are fetched
+        together in one request. Tickers without a price (e.g. a delisted
+        market) are left out.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        now = self.clock()
+        with self._lock:
+            fresh = {t: self._cache[t][0] for t in tickers
+                     if t in self._cache and now - self._cache[t][1] < self.ttl}
+            missing = [t for t in tickers if t not in fresh]
+            self.hits += len(fresh)
+            self.misses += len(missing)
+
+        fetched = self._fetch(missing) if missing else {}
+        now = self.clock()
+        with self._lock:
+            for ticker, price in fetched.items():
+                self._cache[ticker] = (price, now)
+        return {t: fresh.get(t, fetched.get(t)) for t in tickers if t in fresh or t in fetched}
+
+    def get_price(self, ticker):
+        """Current price of one market, or None if it has none."""
+        return self.get_prices([ticker]).get(ticker)
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'requests': self.requests,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def _fetch(self, tickers):
+        """One batched request; per-ticker requests if the batch is rejected (one unknown market fails it)."""
+        try:
+            self.requests += 1
+            prices = pyupbit.get_current_price(tickers)
+            if len(tickers) == 1 and not isinstance(prices, dict):
+                prices = {tickers[0]: prices}
+            if isinstance(prices, dict):
+                return {t: p for t, p in prices.items() if p is not None}
+        except Exception as e:
+            log.warning(f"Batched price request failed ({e}); fetching per ticker")
+        prices = {}
+        for ticker in tickers:
+            try:
+                self.requests += 1
+                price = pyupbit.get_current_price(ticker)
+                if price is not None:
+                    prices[ticker] = price
+            except Exception as e:
+                log.warning(f"No price for {ticker}: {e}")
+        return prices
@@ -0,0 +1,164 @@
+"""
+MicroGPT Benchmark
+- Trains every (model size x backend) case for a few steps and measures
+  steps/sec, tokens/sec, nodes per step and peak memory.
+- Appends each run to a JSON history (``data/microgpt/bench.json``) and
+  flags cases that got slower than the previous run on the same machine by
+  more than ``threshold``.
+- Cases run one after another, each in a fresh worker process: timings do
+  not compete for cores, and peak RSS and compiled-code caches do not carry
+  over from earlier cases.
+- The compiled backend compiles every length bucket before the timed steps
+  and reports that time separately (``compile_sec``), so step timings never
+  include a compile.
+"""
+
+import json
+import platform
+import statistics
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from core.config import PROJECT_ROOT
+from core.logger import get_logger
+
+from .engine import BACKENDS, MicroGPTVisualizer
+
+log = get_logger("microgpt.bench")
+
+# Keys of a result that identify its case, and the metric compared for regressions
+CASE_KEYS = ('backend', 'n_embd', 'n_layer', 'block_size')
+METRIC = 'steps_per_sec'
+
+
+def machine_id():
+    """Timings are only comparable between runs of the same interpreter on the same host."""
+    return f"{platform.node()}/{platform.machine()}/py{platform.python_version()}"
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process so far, or None where ``resource`` is unavailable (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if platform.system() == "Darwin" else peak / 2**10  # bytes on macOS, KiB elsewhere
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                             capture_output=True, text=True, timeout=5, check=False)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def bench_case(size, backend, steps=10, warmup=2, seed=0, data_dir=None):
+    """
+    Benchmarks one case in this process. ``warmup`` steps (caches, loader
+    start-up) are excluded from the timings; nodes per step come from one
+    extra profiled step. ``train_mem_mb`` is how far training (and, for the
+    compiled backend, compilation) raised the peak RSS above the model's
+    set-up peak, so it is only meaningful in a fresh process.
+    """
+    viz = MicroGPTVisualizer(backend=backend, params=size, seed=seed, data_dir=data_dir, write_files=False)
+    viz.num_samples = 1
+    rss_before = _peak_rss_mb()
+    compile_sec = None
+    if backend == "compiled":
+        from .compiler import compile_all
+
+        t0 = time.perf_counter()
+        compile_all(viz)
+        compile_sec = time.perf_counter() - t0
+    viz.num_steps = warmup + steps
+    history = viz.run()['loss_history'][warmup:]
+    rss_after = _peak_rss_mb()
+    step_times = [h['step_time'] for h in history]
+    train_time = sum(step_times)
+
+    viz.num_steps, viz.profile = 1, True
+    profile = viz.run()['profile']
+
+    return {
+        'backend': backend,
+        'n_embd': viz.n_embd,
+        'n_layer': viz.n_layer,
+        'block_size': viz.block_size,
+        'steps': len(step_times),
+        'steps_per_sec': len(step_times) / train_time if train_time else 0.0,
+        'tokens_per_sec': sum(h['tokens'] for h in history) / train_time if train_time else 0.0,
+        'median_step_ms': statistics.median(step_times) * 1000 if step_times else 0.0,
+        'compile_sec': compile_sec,
+        'nodes_per_step': profile['nodes_per_step'],
+        'peak_rss_mb': rss_after,
+        'train_mem_mb': rss_after - rss_before if rss_after is not None else None,
+    }
+
+
+def find_regressions(results, baseline, threshold):
+    """Cases in ``results`` whose metric fell more than ``threshold`` (a fraction) below ``baseline``."""
+    previous = {tuple(r[k] for k in CASE_KEYS): r for r in baseline}
+    regressions = []
+    for r in results:
+        base = previous.get(tuple(r[k] for k in CASE_KEYS))
+        if base and base[METRIC] and r[METRIC] < base[METRIC] * (1 - threshold):
+            regressions.append(dict(r, baseline=base[METRIC], change=r[METRIC] / base[METRIC] - 1))
+    return regressions
+
+
+def run_benchmark(sizes, backends=None, steps=10, warmup=2, seed=0, threshold=0.1,
+                  data_dir=None, history_file=None):
+    """
+    Benchmarks each size dict (``n_embd``/``n_layer``/``block_size``/...) on
+    each backend (default: all; a size may narrow them with its own
+    ``backends`` list), appends the run to ``history_file`` (default
+    ``data_dir/bench.json``) and returns it, including the ``regressions``
+    against the latest earlier run from this machine.
+    """
+    backends = list(backends or BACKENDS)
+    data_dir = data_dir or PROJECT_ROOT / "data" / "microgpt"
+    history_file = history_file or data_dir / "bench.json"
+    history = json.loads(history_file.read_text(encoding='utf-8')) if history_file.exists() else []
+
+    results = []
+    for size in sizes:
+        size = dict(size)
+        allowed = size.pop('backends', None) or backends
+        for backend in (b for b in backends if b in allowed):
+            log.info(f"Benchmarking {backend} {size}...")
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                results.append(pool.submit(bench_case, size, backend, steps, warmup, seed, data_dir).result())
+
+    machine = machine_id()
+    baseline = next((run for run in reversed(history) if run['machine'] == machine), None)
+    regressions = find_regressions(results, baseline['results'], threshold) if baseline else []
+
+    for r in results:
+        log.info(f"{r['backend']:<9} n_embd={r['n_embd']:<3} n_layer={r['n_layer']} block={r['block_size']:<3} | "
+                 f"{r['steps_per_sec']:8.2f} steps/s | {r['tokens_per_sec']:9.0f} tok/s | "
+                 f"{r['nodes_per_step']:8.0f} nodes/step | peak RSS {r['peak_rss_mb'] or 0:6.1f} MB "
+                 f"(+{r['train_mem_mb'] or 0:.1f} MB training)"
+                 + (f" | compile {r['compile_sec']:.1f}s" if r['compile_sec'] is not None else ""))
+    for r in regressions:
+        log.warning(f"Regression: {r['backend']} n_embd={r['n_embd']} n_layer={r['n_layer']} "
+                    f"block={r['block_size']}: {r[METRIC]:.2f} vs {r['baseline']:.2f} {METRIC} ({r['change']:+.1%})")
+
+    run = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'machine': machine,
+        'steps': steps,
+        'warmup': warmup,
+        'threshold': threshold,
+        'results': results,
+        'regressions': regressions,
+    }
+    history.append(run)
+    with open(history_file, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    log.info(f"Benchmark history saved to {history_file} ({len(history)} runs)")
+    return run
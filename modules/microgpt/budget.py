@@ -0,0 +1,114 @@
+"""
+MicroGPT Training Budget
+- Decides when the training loop stops: after ``num_steps``, or when a
+  wall-clock / CPU-time budget would be exceeded by the next step.
+- Reports training progress (drives the linear learning-rate decay), mean
+  step time and ETA.
+- ``stop_on_sigterm`` turns SIGTERM into a graceful stop request, so a
+  killed scheduled run still checkpoints and samples.
+"""
+
+import contextlib
+import signal
+import threading
+import time
+
+from core.logger import get_logger
+
+log = get_logger("microgpt.budget")
+
+
+class TrainingBudget:
+    """
+    Step budget ``max_steps``, optionally bounded by ``wall_seconds`` and/or
+    ``cpu_seconds`` (``time.process_time``). With a time budget set, steps
+    are unlimited unless ``max_steps`` is given too.
+    """
+
+    def __init__(self, max_steps=None, wall_seconds=None, cpu_seconds=None):
+        self.max_steps = max_steps
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.steps = 0
+        self.stop_reason = None
+        self._stop_requested = False
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._step_wall = 0.0  # running mean of one step's wall time
+        self._step_cpu = 0.0
+
+    @property
+    def timed(self):
+        return self.wall_seconds is not None or self.cpu_seconds is not None
+
+    def wall_elapsed(self):
+        return time.perf_counter() - self._wall_start
+
+    def cpu_elapsed(self):
+        return time.process_time() - self._cpu_start
+
+    def progress(self):
+        """Fraction of the budget used so far, in [0, 1]: the tightest of steps, wall and CPU time."""
+        fractions = [0.0]
+        if self.max_steps:
+            fractions.append(self.steps / self.max_steps)
+        if self.wall_seconds:
+            fractions.append(self.wall_elapsed() / self.wall_seconds)
+        if self.cpu_seconds:
+            fractions.append(self.cpu_elapsed() / self.cpu_seconds)
+        return min(max(fractions), 1.0)
+
+    def request_stop(self, reason="signal"):
+        self._stop_requested = True
+        self.stop_reason = self.stop_reason or reason
+
+    def should_continue(self):
+        """False once a budget is spent, or would be by one more (average) step."""
+        if self._stop_requested:
+            return False
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            self.stop_reason = 'steps'
+        elif self.wall_seconds is not None and self.wall_elapsed() + self._step_wall > self.wall_seconds:
+            self.stop_reason = 'wall_time'
+        elif self.cpu_seconds is not None and self.cpu_elapsed() + self._step_cpu > self.cpu_seconds:
+            self.stop_reason = 'cpu_time'
+        return self.stop_reason is None
+
+    def record_step(self, wall_time, cpu_time):
+        self.steps += 1
+        self._step_wall += (wall_time - self._step_wall) / self.steps
+        self._step_cpu += (cpu_time - self._step_cpu) / self.steps
+
+    @property
+    def mean_step_time(self):
+        return self._step_wall
+
+    def eta(self):
+        """Seconds of training left (estimated from the mean step time for step budgets)."""
+        left = []
+        if self.max_steps is not None:
+            left.append((self.max_steps - self.steps) * self._step_wall)
+        if self.wall_seconds is not None:
+            left.append(self.wall_seconds - self.wall_elapsed())
+        if self.cpu_seconds is not None and self._step_cpu > 0:
+            # CPU budget left, converted to wall time at the observed CPU/wall ratio
+            left.append((self.cpu_seconds - self.cpu_elapsed()) * self._step_wall / self._step_cpu)
+        return max(min(left), 0.0) if left else float('inf')
+
+
+@contextlib.contextmanager
+def stop_on_sigterm(budget):
+    """Routes SIGTERM to ``budget.request_stop`` while the block runs (main thread only)."""
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def handler(signum, frame):
+        log.warning("SIGTERM received: stopping after the current step")
+        budget.request_stop('signal')
+
+    previous = signal.signal(signal.SIGTERM, handler)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)
@@ -0,0 +1,73 @@
+"""
+MicroGPT Checkpoints
+- One ``.npz`` file: the flat parameter buffer, Adam's ``m``/``v`` buffers,
+  step counters and a small JSON header describing the model.
+- Saving and loading are a few bulk array copies (O(params) memcpy), not a
+  walk over ``Value`` objects.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from core.logger import get_logger
+
+log = get_logger("microgpt.checkpoint")
+
+FORMAT_VERSION = 1
+
+
+def model_header(model):
+    """Everything a checkpoint must agree on to be loaded into ``model``."""
+    return {
+        'version': FORMAT_VERSION,
+        'n_layer': model.n_layer,
+        'n_embd': model.n_embd,
+        'n_head': model.n_head,
+        'block_size': model.block_size,
+        'vocab': list(model.uchars),
+    }
+
+
+def save(model, path):
+    """Writes ``model``'s weights and optimizer state to ``path`` (atomically)."""
+    opt = model.optimizer
+    header = dict(model_header(model), step=opt.t, next_doc=model.next_doc)
+    arrays = {f'row_steps.{name}': steps for name, steps in opt.row_steps.items()}
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        np.savez(f, header=np.array(json.dumps(header)), data=model.flat_data, m=opt.m, v=opt.v, **arrays)
+    os.replace(tmp, path)
+    log.info(f"Checkpoint saved to {path} (step {opt.t})")
+
+
+def load(model, path):
+    """
+    Restores a checkpoint written by ``save`` into ``model`` in place.
+    Returns False, leaving the model untouched, if the file is missing or
+    was written for a different model shape or vocabulary.
+    """
+    if not path.exists():
+        return False
+    with np.load(path) as ckpt:
+        header = json.loads(str(ckpt['header']))
+        expected = model_header(model)
+        mismatched = [k for k in expected if header.get(k) != expected[k]]
+        if mismatched:
+            log.warning(f"Ignoring checkpoint {path}: {', '.join(mismatched)} differ from the current model")
+            return False
+
+        opt = model.optimizer
+        # In-place copies keep the per-matrix views (and NumPy tensors) pointing at the buffers
+        model.flat_data[:] = ckpt['data']
+        opt.m[:] = ckpt['m']
+        opt.v[:] = ckpt['v']
+        opt.t = header['step']
+        for name, steps in opt.row_steps.items():
+            key = f'row_steps.{name}'
+            steps[:] = ckpt[key] if key in ckpt else opt.t
+    model.next_doc = header['next_doc']
+    model._scatter_data()
+    log.info(f"Resumed from {path} (step {opt.t})")
+    return True
@@ -0,0 +1,270 @@
+"""
+MicroGPT Graph Compiler
+- Traces ``MicroGPTVisualizer.gpt`` once per model shape and length bucket.
+- Emits straight-line Python for the loss and its gradient over flat float
+  lists, ``exec``s it and caches the resulting function.
+- The compiled step allocates no ``Value`` nodes and dispatches no
+  ``_backward`` calls, while staying plain, readable Python.
+
+Compiling is expensive: the generated source grows with
+``n_layer * n_embd**2 * seq_len``. At the default size (1 layer, n_embd 16)
+the 16-position function is ~21k lines, and all five buckets take ~3 s and
+~300 MB peak RSS; at n_embd 32 / 2 layers one length takes ~11 s and ~2 GB. Lengths are therefore
+rounded up to a power of two (capped at ``block_size``) and the tail masked
+out of the loss, so packed training compiles at most ``log2(block_size) + 1``
+functions per shape, and at most ``_MAX_CACHED`` functions are kept.
+"""
+
+import collections
+import copy
+import math
+from collections.abc import Callable
+
+from .engine import ADD, EXP, LOG, MUL, OP_NAMES, POW, RELU, Tape, Value, _sum
+
+# (n_layer, n_embd, n_head, vocab_size, block_size, bucket) -> compiled function, least recently used first
+_CACHE: collections.OrderedDict[tuple, Callable] = collections.OrderedDict()
+_MAX_CACHED = 8
+
+# Longest '+' chain per statement; keeps CPython's compiler recursion shallow
+_MAX_TERMS = 64
+
+# Compiler-only op: the max of its parents, a constant to the backward pass
+_MAX = len(OP_NAMES)
+
+
+def bucket(seq_len, block_size):
+    """The compiled length serving documents of ``seq_len`` positions."""
+    return max(seq_len, min(1 << (seq_len - 1).bit_length(), block_size))
+
+
+def compile_loss(model, seq_len):
+    """
+    Returns ``loss_and_grad(P, tokens) -> (loss, G)`` for documents of up to
+    ``bucket(seq_len)`` predicted positions, where ``P`` and ``G`` are flat
+    lists in ``model.params`` order and ``tokens`` are the document's
+    ``n + 1`` ids; positions past ``n`` are padded and carry no loss.
+    ``fn.source`` is the generated code and ``fn.op_counts`` the traced ops.
+    """
+    key = (model.n_layer, model.n_embd, model.n_head, model.vocab_size, model.block_size,
+           bucket(seq_len, model.block_size))
+    fn = _CACHE.get(key)
+    if fn is None:
+        fn = _CACHE[key] = _compile(model, key[-1], key)
+        while len(_CACHE) > _MAX_CACHED:
+            _CACHE.popitem(last=False)
+    _CACHE.move_to_end(key)
+    return fn
+
+
+def compile_all(model):
+    """Compiles every length bucket of ``model`` up front (e.g. before timing steps); returns how many."""
+    lengths = {bucket(n, model.block_size) for n in range(1, model.block_size + 1)}
+    for n in lengths:
+        compile_loss(model, n)
+    return len(lengths)
+
+
+def _stable_softmax(logits):
+    """Softmax with the max logit subtracted, like ``softmax_floats`` and the fused ops."""
+    m = Value(max(x.data for x in logits), tuple(logits), _MAX)
+    counts = [(x - m).exp() for x in logits]
+    total = _sum(counts)
+    return [c / total for c in counts]
+
+
+class _TokenRows:
+    """Stands in for ``wte`` while tracing: row ``pos`` is the embedding of ``tokens[pos]``."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __getitem__(self, pos):
+        return self.rows[pos]
+
+
+def _trace(model, seq_len):
+    """Runs the scalar forward once on placeholder leaves, recording it on a tape."""
+    leaves = {}  # leaf Value -> ('param', flat index) | ('token', index expression)
+    state_dict = {}
+    offset = 0
+    for name, mat in model.state_dict.items():
+        if name == 'wte':
+            wte_offset = offset
+        rows = []
+        for row in mat:
+            rows.append([Value(p.data) for p in row])
+            for leaf in rows[-1]:
+                leaves[leaf] = ('param', offset)
+                offset += 1
+        state_dict[name] = rows
+
+    # Embedding rows depend on the token ids, which are only known at call time
+    n_embd = model.n_embd
+    bos_row = [p.data for p in model.state_dict['wte'][model.BOS]]
+    token_rows = []
+    for pos in range(seq_len):
+        token_rows.append([Value(x) for x in bos_row])
+        for j, leaf in enumerate(token_rows[-1]):
+            leaves[leaf] = ('token', f"{wte_offset + j} + {n_embd} * T{pos}")
+    state_dict['wte'] = _TokenRows(token_rows)
+
+    # Trace the primitive graph: the emitter folds sums itself
+    tracer = copy.copy(model)
+    tracer.state_dict = state_dict
+    tracer.fused_ops = False
+    tracer.softmax = _stable_softmax
+
+    # The output log-softmax is emitted by ``_compile`` itself (log-sum-exp, as the NLL op does)
+    logits = []
+    keys, values = [[] for _ in range(model.n_layer)], [[] for _ in range(model.n_layer)]
+    with Tape() as tape:
+        for pos in range(seq_len):
+            logits.append(tracer.gpt(pos, pos, keys, values))
+    return tape.nodes, leaves, logits
+
+
+def _emit_sum(lines, target, exprs, assign='='):
+    for i in range(0, len(exprs), _MAX_TERMS):
+        lines.append(f"    {target} {assign if i == 0 else '+='} {' + '.join(exprs[i:i + _MAX_TERMS])}")
+
+
+def _compile(model, seq_len, key):
+    nodes, leaves, logits = _trace(model, seq_len)
+    index = {v: k for k, v in enumerate(nodes)}
+
+    # Single-use '+' and '*' nodes feeding a '+' are folded into one n-ary sum
+    uses, consumer = {}, {}
+    for u in nodes:
+        for a in u._prev:
+            if a in index:
+                uses[a] = uses.get(a, 0) + 1
+                consumer[a] = u
+    folded = {v for v, n in uses.items() if n == 1 and v._op in (ADD, MUL) and consumer[v]._op == ADD}
+
+    def name(v):
+        if v in index:
+            return f"v{index[v]}"
+        kind, where = leaves.get(v, (None, None))
+        if kind == 'param':
+            return f"p{where}"
+        if kind == 'token':
+            return f"P[{where}]"
+        return repr(v.data)  # shared constant
+
+    def terms(v):
+        out, stack = [], [v]
+        while stack:
+            u = stack.pop()
+            if u is v or (u in folded and u._op == ADD):
+                stack.extend(reversed(u._prev))
+            else:
+                out.append(u)
+        return out
+
+    def term_expr(t):
+        if t in folded:
+            a, b = t._prev
+            return f"{name(a)} * {name(b)}"
+        return name(t)
+
+    n_params = len(model.params)
+    lines = [
+        "def loss_and_grad(P, tokens):",
+        f"    {', '.join(f'p{i}' for i in range(n_params))}, = P",
+        # Shorter documents are padded with BOS; their padded positions get zero loss weight
+        "    n = len(tokens) - 1",
+        f"    {', '.join(f'T{pos}' for pos in range(seq_len + 1))}, = "
+        f"(*tokens, *[{model.BOS}] * {seq_len})[:{seq_len + 1}]",
+        "    w = 1 / n",
+    ]
+
+    # Forward
+    for v in nodes:
+        if v in folded:
+            continue
+        out, op, prev = name(v), v._op, v._prev
+        if op == ADD:
+            _emit_sum(lines, out, [term_expr(t) for t in terms(v)])
+        elif op == MUL:
+            lines.append(f"    {out} = {name(prev[0])} * {name(prev[1])}")
+        elif op == POW:
+            lines.append(f"    {out} = {name(prev[0])} ** {v._arg!r}")
+        elif op == EXP:
+            lines.append(f"    {out} = exp({name(prev[0])})")
+        elif op == LOG:
+            lines.append(f"    {out} = log({name(prev[0])})")
+        elif op == RELU:
+            a = name(prev[0])
+            lines.append(f"    {out} = 0 if {a} < 0 else {a}")
+        elif op == _MAX:
+            lines.append(f"    {out} = max(({', '.join(name(p) for p in prev)},))")
+
+    # Loss: mean of logsumexp(logits) - logits[target] over the first n positions, targets picked at run time
+    for pos, row in enumerate(logits):
+        row = ', '.join(name(x) for x in row)
+        lines.append(f"    m{pos} = max(({row},))")
+        lines.append(f"    e{pos} = [exp(x - m{pos}) for x in ({row},)]")
+        lines.append(f"    s{pos} = sum(e{pos})")
+        lines.append(f"    nll{pos} = log(s{pos}) + m{pos} - ({row},)[T{pos + 1}]")
+        lines.append(f"    w{pos} = w" if pos == 0 else f"    w{pos} = w if {pos} < n else 0.0")
+    _emit_sum(lines, "loss", [f"nll{pos} * w{pos}" for pos in range(seq_len)])
+
+    # Backward: every gradient is written once as the sum of its contributions
+    lines.append(f"    G = [0.0] * {n_params}")
+    contrib = {}
+
+    def add(target, expr):
+        # The softmax shift cancels out of the gradient, so nothing flows into it
+        if (target in index and target._op != _MAX) or target in leaves:
+            contrib.setdefault(target, []).append(expr)
+
+    # d nll / d logit = softmax - onehot(target)
+    for pos, row in enumerate(logits):
+        lines.append(f"    g_s{pos} = w{pos} / s{pos}")
+        for k, x in enumerate(row):
+            add(x, f"(e{pos}[{k}] * g_s{pos} - (w{pos} if T{pos + 1} == {k} else 0.0))")
+
+    for v in reversed(nodes):
+        if v in folded or v not in contrib:
+            continue
+        g, op, prev = f"g{index[v]}", v._op, v._prev
+        _emit_sum(lines, g, contrib.pop(v))
+        if op == ADD:
+            for t in terms(v):
+                if t in folded:
+                    a, b = t._prev
+                    add(a, f"{name(b)} * {g}")
+                    add(b, f"{name(a)} * {g}")
+                else:
+                    add(t, g)
+        elif op == MUL:
+            a, b = prev
+            add(a, f"{name(b)} * {g}")
+            add(b, f"{name(a)} * {g}")
+        elif op == POW:
+            add(prev[0], f"({v._arg!r} * {name(prev[0])} ** {v._arg - 1!r}) * {g}")
+        elif op == EXP:
+            add(prev[0], f"{name(v)} * {g}")
+        elif op == LOG:
+            add(prev[0], f"(1 / {name(prev[0])}) * {g}")
+        elif op == RELU:
+            add(prev[0], f"({g} if {name(v)} > 0 else 0.0)")
+
+    for leaf, exprs in contrib.items():
+        kind, where = leaves[leaf]
+        if kind == 'param':
+            _emit_sum(lines, f"G[{where}]", exprs)
+        else:
+            _emit_sum(lines, f"G[{where}]", exprs, assign='+=')
+
+    lines.append("    return loss, G")
+    source = "\n".join(lines) + "\n"
+
+    namespace = {'exp': math.exp, 'log': math.log}
+    exec(compile(source, f"<microgpt-compiled {key}>", "exec"), namespace)
+    fn = namespace['loss_and_grad']
+    fn.source = source
+    # The traced graph the function evaluates, for the profiler's node counters
+    fn.op_counts = collections.Counter(OP_NAMES[v._op] if v._op != _MAX else 'max' for v in nodes)
+    return fn
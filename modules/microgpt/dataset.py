@@ -0,0 +1,128 @@
+"""
+MicroGPT Token Dataset
+- One-time tokenization of ``input.txt`` into a flat token file (uint8, or
+  uint16 for vocabularies above 256) plus a document-offset index.
+- Files are keyed by the SHA-256 of the input and opened through ``mmap``,
+  so a warm start reads no text and tokenizes nothing.
+- Documents are stored already shuffled, together with the RNG state the
+  shuffle left behind, so model initialisation draws the same weights as a
+  cold start.
+"""
+
+import hashlib
+import json
+import mmap
+import random
+from array import array
+
+from core.logger import get_logger
+
+log = get_logger("microgpt.dataset")
+
+SHUFFLE_SEED = 42
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class TokenDataset:
+    """
+    Read-only view of a tokenized corpus. ``len(ds)`` documents; ``ds.tokens(i)``
+    is document ``i`` as a list of character ids (no BOS) and ``ds[i]`` its text.
+    """
+
+    def __init__(self, meta, tokens, offsets, buffers=()):
+        self.uchars = meta['uchars']
+        self.rng_state = meta['rng_state']
+        self._tokens = tokens
+        self._offsets = offsets
+        self._buffers = buffers
+
+    @classmethod
+    def load(cls, input_file, cache_dir):
+        """Opens the cache for ``input_file``, building it first if it is missing or stale."""
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        stat = input_file.stat()
+        index_file = cache_dir / "index.json"
+
+        # Re-hash only when the input file changed on disk
+        index = json.loads(index_file.read_text(encoding='utf-8')) if index_file.exists() else {}
+        entry = index.get(str(input_file))
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            digest = entry['sha256']
+        else:
+            digest = file_digest(input_file)
+            index[str(input_file)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+            index_file.write_text(json.dumps(index, indent=2), encoding='utf-8')
+
+        prefix = cache_dir / digest[:16]
+        meta_file = prefix.with_suffix('.json')
+        if not meta_file.exists():
+            cls.build(input_file, prefix)
+        meta = json.loads(meta_file.read_text(encoding='utf-8'))
+        meta['rng_state'] = (meta['rng_state'][0], tuple(meta['rng_state'][1]), meta['rng_state'][2])
+
+        buffers = []
+
+        def open_view(suffix, typecode):
+            with open(prefix.with_suffix(suffix), 'rb') as f:
+                if f.seek(0, 2) == 0:  # mmap cannot map an empty file
+                    return memoryview(b'').cast(typecode)
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            buffers.append(buf)
+            return memoryview(buf).cast(typecode)
+
+        return cls(meta, open_view('.tokens', meta['token_type']), open_view('.offsets', meta['offset_type']),
+                   buffers)
+
+    @staticmethod
+    def build(input_file, prefix):
+        log.info(f"Tokenizing {input_file.name} into {prefix.name}.*")
+        with open(input_file, 'r', encoding='utf-8') as f:
+            docs = [line.strip() for line in f if line.strip()]
+        random.seed(SHUFFLE_SEED)
+        random.shuffle(docs)
+
+        uchars = sorted(set(''.join(docs)))
+        stoi = {ch: i for i, ch in enumerate(uchars)}
+        # +1 keeps room for BOS, which is never stored
+        token_type = 'B' if len(uchars) + 1 <= 0xFF else 'H'
+        tokens = array(token_type)
+        offsets = array('Q', [0])
+        for doc in docs:
+            tokens.extend(stoi[ch] for ch in doc)
+            offsets.append(len(tokens))
+
+        with open(prefix.with_suffix('.tokens'), 'wb') as f:
+            tokens.tofile(f)
+        with open(prefix.with_suffix('.offsets'), 'wb') as f:
+            offsets.tofile(f)
+        # Written last: its presence marks a complete cache entry
+        meta = {
+            'uchars': uchars,
+            'n_docs': len(docs),
+            'token_type': token_type,
+            'offset_type': 'Q',
+            'rng_state': random.getstate(),
+        }
+        prefix.with_suffix('.json').write_text(json.dumps(meta), encoding='utf-8')
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def tokens(self, i):
+        return self._tokens[self._offsets[i]:self._offsets[i + 1]].tolist()
+
+    def __getitem__(self, i):
+        return ''.join(self.uchars[t] for t in self.tokens(i))
+
+    def close(self):
+        self._tokens.release()
+        self._offsets.release()
+        for buf in self._buffers:
+            buf.close()
@@ -1,100 +1,235 @@
 
+import collections
+import contextlib
+import functools
 import json
 import math
+import operator
 import random
+import time
 import urllib.request
+from array import array
 
-from core.config import PROJECT_ROOT
+import numpy as np
+
+from core.config import PROJECT_ROOT, Config
 from core.logger import get_logger
 
+from .dataset import TokenDataset
+from .optim import Adam
+
 log = get_logger("microgpt.engine")
 
+# Op codes: nodes store a small int instead of a label string and a closure.
+# DOT/RMS/ATTN/NLL are fused ops: one node with many parents and an analytic backward.
+LEAF, ADD, MUL, POW, EXP, LOG, RELU, DOT, RMS, ATTN, NLL = range(11)
+OP_NAMES = ('', '+', '*', '**', 'exp', 'log', 'ReLU', 'dot', 'rms', 'attn', 'nll')
+
+# Active Tape (see ``Tape``); nodes created while it is set are recorded on it
+_tape = None
+
+# Cleared inside ``no_grad()``: new nodes keep no parents and are never taped
+_grad_enabled = True
+
+# Shared leaves for Python numbers (-1, eps, attention scale, 1/n, ...)
+_CONSTANTS: dict[float, "Value"] = {}
+_MAX_CONSTANTS = 1024
+
+
+def const(x):
+    """
+    Returns a shared leaf ``Value`` for the number ``x``.
+    Constants are never trained, so one node per distinct number is enough;
+    their ``grad`` accumulates across graphs and carries no meaning.
+    """
+    c = _CONSTANTS.get(x)
+    if c is None:
+        c = Value(x)
+        if len(_CONSTANTS) < _MAX_CONSTANTS:
+            _CONSTANTS[x] = c
+    return c
+
+
+@contextlib.contextmanager
+def no_grad():
+    """
+    Inference mode: ``Value`` and ``Tensor`` results are plain numbers that keep
+    no parents, so nothing is taped and every intermediate is freed at once.
+    """
+    global _grad_enabled
+    prev, _grad_enabled = _grad_enabled, False
+    try:
+        yield
+    finally:
+        _grad_enabled = prev
+
+
+def is_grad_enabled():
+    return _grad_enabled
+
+
+def softmax_floats(xs):
+    """Numerically stable softmax over plain floats."""
+    m = max(xs)
+    exps = [math.exp(x - m) for x in xs]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+def attention_weights(q, keys):
+    """Softmax of the scaled dot products ``q . k / sqrt(d)`` for every cached key."""
+    scale = len(q) ** -0.5
+    return softmax_floats([sum(qi * ki for qi, ki in zip(q, k)) * scale for k in keys])
+
+
+def attention_grads(q, keys, col, weights, grad):
+    """
+    Gradients of ``out = sum_t weights[t] * col[t]`` (one output of a causal
+    attention head) with respect to the query, every key and the value column.
+    """
+    scale = len(q) ** -0.5
+    dw = [v * grad for v in col]
+    mean = sum(w * x for w, x in zip(weights, dw))
+    ds = [w * (x - mean) * scale for w, x in zip(weights, dw)]
+    gq = [sum(d * k[i] for d, k in zip(ds, keys)) for i in range(len(q))]
+    gk = [[d * qi for qi in q] for d in ds]
+    gv = [w * grad for w in weights]
+    return gq, gk, gv
+
+
 class Value:
     """
     Stores a single scalar value and its gradient.
     """
-    # __slots__ = ('data', 'grad', '_children', '_op', 'label')
+    __slots__ = ('data', 'grad', '_prev', '_op', '_arg')
 
-    def __init__(self, data, _children=(), _op='', label=''):
+    def __init__(self, data, _prev=(), _op=LEAF, _arg=None):
         self.data = data
         self.grad = 0
-        self._children = set(_children)
+        if not _grad_enabled:
+            _prev, _op, _arg = (), LEAF, None
+        self._prev = _prev  # parent nodes (tuple, order matters for backward)
         self._op = _op
-        self.label = label
+        self._arg = _arg  # extra operand ('**' exponent, NLL target, ATTN weights)
+        if _prev and _tape is not None:
+            _tape.append(self)
 
     def __repr__(self):
         return f"Value(data={self.data}, grad={self.grad})"
 
+    @property
+    def op(self):
+        if self._op == POW:
+            return f'**{self._arg}'
+        return OP_NAMES[self._op]
+
     def __add__(self, other):
-        other = other if isinstance(other, Value) else Value(other)
-        out = Value(self.data + other.data, (self, other), '+')
-        
-        def _backward():
-            self.grad += out.grad
-            other.grad += out.grad
-        out._backward = _backward
-        return out
+        other = other if isinstance(other, Value) else const(other)
+        return Value(self.data + other.data, (self, other), ADD)
 
     def __mul__(self, other):
-        other = other if isinstance(other, Value) else Value(other)
-        out = Value(self.data * other.data, (self, other), '*')
-        
-        def _backward():
-            self.grad += other.data * out.grad
-            other.grad += self.data * out.grad
-        out._backward = _backward
-        return out
+        other = other if isinstance(other, Value) else const(other)
+        return Value(self.data * other.data, (self, other), MUL)
 
     def __pow__(self, other):
         assert isinstance(other, (int, float)), "only supporting int/float powers for now"
-        out = Value(self.data**other, (self,), f'**{other}')
-
-        def _backward():
-            self.grad += (other * self.data**(other-1)) * out.grad
-        out._backward = _backward
-        return out
+        return Value(self.data**other, (self,), POW, other)
 
     def exp(self):
-        x = self.data
-        out = Value(math.exp(x), (self,), 'exp')
-        
-        def _backward():
-            self.grad += out.data * out.grad
-        out._backward = _backward
-        return out
+        return Value(math.exp(self.data), (self,), EXP)
 
     def log(self):
-        x = self.data
-        out = Value(math.log(x), (self,), 'log')
-
-        def _backward():
-            self.grad += (1/x) * out.grad
-        out._backward = _backward
-        return out
+        return Value(math.log(self.data), (self,), LOG)
 
     def relu(self):
-        out = Value(0 if self.data < 0 else self.data, (self,), 'ReLU')
+        return Value(0 if self.data < 0 else self.data, (self,), RELU)
 
-        def _backward():
-            self.grad += (out.data > 0) * out.grad
-        out._backward = _backward
+    # --- Fused ops (one node each) ---
+
+    @staticmethod
+    def dot(ws, xs):
+        return Value(sum(w.data * x.data for w, x in zip(ws, xs)), (*ws, *xs), DOT)
+
+    @staticmethod
+    def rms_scale(xs, eps=1e-5):
+        """``(mean(x^2) + eps) ** -0.5``; rmsnorm is then ``x_i * scale``."""
+        return Value((sum(x.data * x.data for x in xs) / len(xs) + eps) ** -0.5, tuple(xs), RMS)
+
+    @staticmethod
+    def attention(q, keys, values):
+        """Outputs of one causal attention head over the cached ``keys``/``values``."""
+        q_data = [x.data for x in q]
+        weights = attention_weights(q_data, [[x.data for x in k] for k in keys])
+        flat_keys = tuple(x for k in keys for x in k)
+        out = []
+        for j in range(len(q)):
+            col = tuple(v[j] for v in values)
+            data = sum(w * v.data for w, v in zip(weights, col))
+            out.append(Value(data, (*q, *flat_keys, *col), ATTN, weights))
         return out
 
-    def backward(self):
-        # topological order all of the children in the graph
-        topo = []
-        visited = set()
-        def build_topo(v):
-            if v not in visited:
-                visited.add(v)
-                for child in v._children:
-                    build_topo(child)
-                topo.append(v)
-        build_topo(self)
+    @staticmethod
+    def log_softmax_nll(logits, target):
+        """``-log(softmax(logits)[target])`` with max-subtraction."""
+        m = max(x.data for x in logits)
+        lse = m + math.log(sum(math.exp(x.data - m) for x in logits))
+        return Value(lse - logits[target].data, tuple(logits), NLL, target)
+
+    def _backward(self):
+        # propagate self.grad to the parents according to the op code
+        op, grad = self._op, self.grad
+        if op == ADD:
+            a, b = self._prev
+            a.grad += grad
+            b.grad += grad
+        elif op == MUL:
+            a, b = self._prev
+            a.grad += b.data * grad
+            b.grad += a.data * grad
+        elif op == POW:
+            a, = self._prev
+            a.grad += (self._arg * a.data**(self._arg-1)) * grad
+        elif op == EXP:
+            a, = self._prev
+            a.grad += self.data * grad
+        elif op == LOG:
+            a, = self._prev
+            a.grad += (1/a.data) * grad
+        elif op == RELU:
+            a, = self._prev
+            a.grad += (self.data > 0) * grad
+        elif op == DOT:
+            n = len(self._prev) // 2
+            for a, b in zip(self._prev[:n], self._prev[n:]):
+                a.grad += b.data * grad
+                b.grad += a.data * grad
+        elif op == RMS:
+            c = -self.data**3 / len(self._prev) * grad
+            for a in self._prev:
+                a.grad += c * a.data
+        elif op == NLL:
+            probs = softmax_floats([a.data for a in self._prev])
+            probs[self._arg] -= 1
+            for a, p in zip(self._prev, probs):
+                a.grad += p * grad
+        elif op == ATTN:
+            weights = self._arg
+            t, prev = len(weights), self._prev
+            d = (len(prev) - t) // (t + 1)
+            q, flat_keys, col = prev[:d], prev[d:d + t * d], prev[d + t * d:]
+            keys = [[x.data for x in flat_keys[i * d:(i + 1) * d]] for i in range(t)]
+            gq, gk, gv = attention_grads([x.data for x in q], keys, [x.data for x in col], weights, grad)
+            for a, g in zip(q, gq):
+                a.grad += g
+            for a, g in zip(flat_keys, (g for row in gk for g in row)):
+                a.grad += g
+            for a, g in zip(col, gv):
+                a.grad += g
 
+    def backward(self):
         self.grad = 1
-        for v in reversed(topo):
-            if hasattr(v, '_backward'):
+        for v in reversed(topological_order(self)):
+            if v._prev:
                 v._backward()
 
     def __neg__(self): # -self
@@ -119,43 +254,181 @@ class Value:
         return other * self**-1
 
 
-class MicroGPTVisualizer:
+def topological_order(root):
+    """
+    Post-order of the graph below ``root`` (parents before children).
+    Uses an explicit stack, so deep graphs don't hit the recursion limit.
+    """
+    topo = []
+    visited = {root}
+    stack = [(root, iter(root._prev))]
+    while stack:
+        v, parents = stack[-1]
+        for parent in parents:
+            if parent not in visited:
+                visited.add(parent)
+                stack.append((parent, iter(parent._prev)))
+                break
+        else:
+            stack.pop()
+            topo.append(v)
+    return topo
+
+
+class Tape:
+    """
+    Records every non-leaf ``Value`` created inside ``with Tape() as tape:``.
+    Creation order is already a topological order, so ``backward`` replays the
+    tape in reverse without walking the graph or hashing visited nodes.
+    """
+
     def __init__(self):
-        self.data_dir = PROJECT_ROOT / "data" / "microgpt"
+        self.nodes = []
+        self._outer = None
+
+    def __enter__(self):
+        global _tape
+        self._outer, _tape = _tape, self.nodes
+        return self
+
+    def __exit__(self, *exc):
+        global _tape
+        _tape = self._outer
+
+    def backward(self, root):
+        root.grad = 1
+        for v in reversed(self.nodes):
+            v._backward()
+
+
+def _sum(values):
+    """Sums nodes left to right without a leading ``Value(0)`` node."""
+    return functools.reduce(operator.add, values)
+
+
+BACKENDS = ("scalar", "numpy", "compiled", "soa")
+
+# Attributes that ``MicroGPTVisualizer(params=...)`` and sweep grids may set
+HYPERPARAMS = (
+    "n_layer",
+    "n_embd",
+    "n_head",
+    "block_size",
+    "learning_rate",
+    "num_steps",
+    "time_budget",
+    "cpu_budget",
+    "batch_size",
+    "grad_accum_steps",
+    "weight_decay",
+    "sparse_embeddings",
+    "pack_sequences",
+    "temperature",
+    "top_k",
+    "top_p",
+)
+
+
+def default_data_dir():
+    return PROJECT_ROOT / "data" / "microgpt"
+
+
+def load_corpus(data_dir):
+    """
+    Opens the token cache of ``data_dir/input.txt`` (see ``TokenDataset``),
+    downloading the names corpus first if the file is missing.
+    """
+    input_file = data_dir / "input.txt"
+    if not input_file.exists():
+        log.info("Downloading input.txt...")
+        names_url = 'https://raw.githubusercontent.com/karpathy/makemore/988aa59/names.txt'
+        try:
+            urllib.request.urlretrieve(names_url, str(input_file))
+        except Exception as e:
+            log.error(f"Failed to download input.txt: {e}")
+            # Fallback to dummy data if download fails
+            with open(input_file, 'w') as f:
+                f.write("emma\nolivia\nava\nisabella\nsophia\n")
+
+    # Shuffled, tokenized and memory-mapped once per input file
+    return TokenDataset.load(input_file, data_dir / "cache")
+
+
+def _as_float(x):
+    return float(x) if isinstance(x, (int, float)) else float(x.mean())
+
+
+class MicroGPTVisualizer:
+    def __init__(self, backend="scalar", params=None, seed=None, data_dir=None, write_files=True):
+        """
+        ``params`` overrides any of ``HYPERPARAMS`` on top of
+        ``microgpt.model_params`` from the config; ``seed`` reseeds weight
+        init and sampling (the corpus shuffle is fixed by the dataset cache).
+        ``write_files=False`` keeps a run in memory: no trace, checkpoint or
+        profile file (sweep and benchmark workers report back instead).
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown MicroGPT backend '{backend}' (expected one of {BACKENDS})")
+        self.backend = backend
+
+        self.data_dir = data_dir or default_data_dir()
         self.data_dir.mkdir(parents=True, exist_ok=True)
-        self.trace_file = self.data_dir / "trace.json"
+        self.trace_file = self.data_dir / "trace.json" if write_files else None
+        self.checkpoint_file = self.data_dir / "checkpoint.npz" if write_files else None
+        self.profile_file = self.data_dir / "profile.folded" if write_files else None
         self.input_file = self.data_dir / "input.txt"
         
-        # Hyperparameters
-        self.n_layer = 1
-        self.n_embd = 16
-        self.block_size = 16
-        self.n_head = 4
-        self.head_dim = self.n_embd // self.n_head
+        # Hyperparameters (model shape from config/base.yaml: microgpt.model_params)
+        cfg = Config.instance()
+        model_params = cfg.get("microgpt.model_params", {}) or {}
+        self.n_layer = model_params.get("n_layer", 1)
+        self.n_embd = model_params.get("n_embd", 16)
+        self.block_size = model_params.get("block_size", 16)
+        self.n_head = model_params.get("n_head", 4)
         self.learning_rate = 0.01
+        self.fused_ops = True  # single-node dot/rmsnorm/attention/NLL in the scalar graph
         self.num_steps = 50  # Reduced for quick demo, but enough to show learning curve
+        self.time_budget = cfg.get("microgpt.time_budget")  # wall seconds; if set, train until spent, not num_steps
+        self.cpu_budget = cfg.get("microgpt.cpu_budget")  # same, in process CPU seconds
+        self.batch_size = 1  # documents per forward/backward pass
+        self.grad_accum_steps = 1  # micro-batches averaged into one optimizer step
+        self.weight_decay = 0.0  # > 0 turns Adam into AdamW (decoupled weight decay)
+        self.sparse_embeddings = False  # lazy Adam on wte: update only rows seen in the step
+        self.pack_sequences = True  # several names per block_size window
+        self.prefetch_batches = 2  # micro-batches prepared ahead on a background thread
+        
+        self.resume = False  # continue from checkpoint_file instead of fresh weights, and save back to it
+        self.write_checkpoint = False  # save checkpoint_file after a fresh (non-resumed) run too
+        self.next_doc = 0  # corpus position, carried across resumed runs
+        
+        # Sampling
+        self.num_samples = 5
+        self.temperature = 0.8
+        self.top_k = None  # keep only the k most likely tokens
+        self.top_p = None  # nucleus: smallest token set with this much probability mass
+        
+        self.graph_node_budget = 400  # nodes of the loss graph written to trace.json
+        self.profile = False  # per-phase timings and node counters in trace.json + profile_file
+        self.profiler = None
+        
+        for name, value in (params or {}).items():
+            if name not in HYPERPARAMS:
+                raise ValueError(f"Unknown MicroGPT hyperparameter '{name}' (expected one of {HYPERPARAMS})")
+            setattr(self, name, value)
+        if self.n_embd % self.n_head:
+            raise ValueError(f"n_embd ({self.n_embd}) must be divisible by n_head ({self.n_head})")
+        self.head_dim = self.n_embd // self.n_head
         
         self._prepare_data()
+        if seed is not None:
+            random.seed(seed)
         self._init_model()
 
     def _prepare_data(self):
-        # Similar to original code but uses established paths
-        if not self.input_file.exists():
-            log.info("Downloading input.txt...")
-            names_url = 'https://raw.githubusercontent.com/karpathy/makemore/988aa59/names.txt'
-            try:
-                urllib.request.urlretrieve(names_url, str(self.input_file))
-            except Exception as e:
-                log.error(f"Failed to download input.txt: {e}")
-                # Fallback to dummy data if download fails
-                with open(self.input_file, 'w') as f:
-                    f.write("emma\nolivia\nava\nisabella\nsophia\n")
-        
-        self.docs = [line.strip() for line in open(self.input_file, 'r', encoding='utf-8') if line.strip()]
-        random.seed(42)
-        random.shuffle(self.docs)
+        self.docs = load_corpus(self.data_dir)
+        random.setstate(self.docs.rng_state)
         
-        self.uchars = sorted(set(''.join(self.docs)))
+        self.uchars = self.docs.uchars
         self.vocab_size = len(self.uchars) + 1 # +1 for BOS
         self.BOS = len(self.uchars)
         self.stoi = {ch:i for i,ch in enumerate(self.uchars)}
@@ -163,50 +436,93 @@ class MicroGPTVisualizer:
         self.itos[self.BOS] = '.' # Visual representation for BOS/EOS
 
     def _init_model(self):
-        # Helper to create matrix of Values
+        # Helper to create matrix of initial weights (same draw order for every backend)
         def matrix(nout, nin, std=0.08):
-            return [[Value(random.gauss(0, std)) for _ in range(nin)] for _ in range(nout)]
+            return [[random.gauss(0, std) for _ in range(nin)] for _ in range(nout)]
 
-        self.state_dict = {
+        weights = {
             'wte': matrix(self.vocab_size, self.n_embd),
             'wpe': matrix(self.block_size, self.n_embd),
             'lm_head': matrix(self.vocab_size, self.n_embd)
         }
         
         for i in range(self.n_layer):
-            self.state_dict[f'layer{i}.attn_wq'] = matrix(self.n_embd, self.n_embd)
-            self.state_dict[f'layer{i}.attn_wk'] = matrix(self.n_embd, self.n_embd)
-            self.state_dict[f'layer{i}.attn_wv'] = matrix(self.n_embd, self.n_embd)
-            self.state_dict[f'layer{i}.attn_wo'] = matrix(self.n_embd, self.n_embd)
-            self.state_dict[f'layer{i}.mlp_fc1'] = matrix(4 * self.n_embd, self.n_embd)
-            self.state_dict[f'layer{i}.mlp_fc2'] = matrix(self.n_embd, 4 * self.n_embd)
-            
+            weights[f'layer{i}.attn_wq'] = matrix(self.n_embd, self.n_embd)
+            weights[f'layer{i}.attn_wk'] = matrix(self.n_embd, self.n_embd)
+            weights[f'layer{i}.attn_wv'] = matrix(self.n_embd, self.n_embd)
+            weights[f'layer{i}.attn_wo'] = matrix(self.n_embd, self.n_embd)
+            weights[f'layer{i}.mlp_fc1'] = matrix(4 * self.n_embd, self.n_embd)
+            weights[f'layer{i}.mlp_fc2'] = matrix(self.n_embd, 4 * self.n_embd)
+
+        # Every parameter lives in one flat buffer, in state_dict order, row-major
+        self.flat_data = np.array([x for w in weights.values() for row in w for x in row])
+        self.flat_grad = np.zeros_like(self.flat_data)
+        # Lazy mode: only wte rows of tokens seen in the step are updated (wte comes first)
+        sparse = {'wte': (0, self.vocab_size, self.n_embd)} if self.sparse_embeddings else None
+        self.optimizer = Adam(self.flat_data, self.flat_grad, weight_decay=self.weight_decay, sparse=sparse)
+
+        # Per-matrix views into the flat buffers (graph-free inference reads these)
+        self.weights, grads, offset = {}, {}, 0
+        for name, w in weights.items():
+            shape = (len(w), len(w[0]))
+            size = shape[0] * shape[1]
+            self.weights[name] = self.flat_data[offset:offset + size].reshape(shape)
+            grads[name] = self.flat_grad[offset:offset + size].reshape(shape)
+            offset += size
+
+        if self.backend == "numpy":
+            from .tensor import Tensor
+
+            # One Tensor per matrix, whose data and grad are the views above
+            self.state_dict = {}
+            for name, view in self.weights.items():
+                self.state_dict[name] = Tensor(view)
+                self.state_dict[name].grad = grads[name]
+            self.params = list(self.state_dict.values())
+            return
+
+        if self.backend == "soa":
+            from .graph import Graph, Node
+
+            # Parameters are the first rows of the graph store; each step truncates back to them
+            self.graph = Graph()
+            node = self.graph.leaf
+            self.node_type = Node
+        else:
+            node = Value
+            self.node_type = Value
+
+        self.state_dict = {name: [[node(x) for x in row] for row in w] for name, w in weights.items()}
         self.params = [p for mat in self.state_dict.values() for row in mat for p in row]
-        
-        # Optimizer buffers
-        self.m = [0.0] * len(self.params)
-        self.v = [0.0] * len(self.params)
 
     # --- Model Functions (Methods) ---
     
     def linear(self, x, w):
-        return [sum((wi * xi for wi, xi in zip(wo, x)), Value(0)) for wo in w]
+        if self.fused_ops:
+            return [self.node_type.dot(wo, x) for wo in w]
+        return [_sum(wi * xi for wi, xi in zip(wo, x)) for wo in w]
 
     def softmax(self, logits):
         # max_val for stability (optional in pure math but good practice)
         # Using simple exp here for direct Value graph
         counts = [logit.exp() for logit in logits]
-        denominator = sum(counts, Value(0))
+        denominator = _sum(counts)
         out = [c / denominator for c in counts]
         return out
 
     def rmsnorm(self, x):
-        ms = sum((xi * xi for xi in x), Value(0)) / len(x)
+        if self.fused_ops:
+            scale = self.node_type.rms_scale(x)
+            return [xi * scale for xi in x]
+        ms = _sum(xi * xi for xi in x) / len(x)
         # Add small epsilon to avoid division by zero
         scale = (ms + 1e-5)**-0.5 
         return [xi * scale for xi in x]
 
     def gpt(self, token_id, pos_id, keys, values):
+        if self.backend == "numpy":
+            return self._gpt_tensor(token_id, pos_id, keys, values)
+
         # Embeddings
         tok_emb = self.state_dict['wte'][token_id]
         pos_emb = self.state_dict['wpe'][pos_id]
@@ -227,185 +543,464 @@ class MicroGPTVisualizer:
             keys[li].append(k)
             values[li].append(v)
             
-            x_attn = []
-            for h in range(self.n_head):
-                hs = h * self.head_dim
-                q_h = q[hs : hs + self.head_dim]
-                
-                # Causal attention: attend to past keys
-                # Flatten head logic slightly for clarity
-                k_h_past = [ki[hs : hs + self.head_dim] for ki in keys[li]]
-                v_h_past = [vi[hs : hs + self.head_dim] for vi in values[li]]
-                
-                # Attention scores
-                # (query . key) / sqrt(dim)
-                scale = self.head_dim ** -0.5
-                attn_logits = []
-                for t, k_vec in enumerate(k_h_past):
-                    dot = sum((q_h[j] * k_vec[j] for j in range(self.head_dim)), Value(0))
-                    attn_logits.append(dot * scale)
-                
-                attn_weights = self.softmax(attn_logits)
-                
-                # Weighted sum of values
-                head_out = []
-                for j in range(self.head_dim):
-                    # sum(weight[t] * val[t][j])
-                    val = sum((attn_weights[t] * v_h_past[t][j] for t in range(len(v_h_past))), Value(0))
-                    head_out.append(val)
-                x_attn.extend(head_out)
-            
             # Projection
-            x = self.linear(x_attn, self.state_dict[f'layer{li}.attn_wo'])
+            x = self.linear(self._attend(q, keys[li], values[li]), self.state_dict[f'layer{li}.attn_wo'])
             x = [a + b for a, b in zip(x, x_residual)]
             
             # MLP
-            x_residual = x
-            x = self.rmsnorm(x)
-            x = self.linear(x, self.state_dict[f'layer{li}.mlp_fc1'])
-            x = [xi.relu() for xi in x]
-            x = self.linear(x, self.state_dict[f'layer{li}.mlp_fc2'])
-            x = [a + b for a, b in zip(x, x_residual)]
+            x = self._mlp(x, li)
 
         logits = self.linear(x, self.state_dict['lm_head'])
         return logits
 
-    def trace_graph(self, root):
-        nodes, edges = set(), set()
-        def build(v):
-            if v not in nodes:
-                nodes.add(v)
-                for child in v._children:
-                    edges.add((child, v))
-                    build(child)
-        build(root)
-        return nodes, edges
+    def _attend(self, q, keys, values):
+        """Causal multi-head attention of one query over the keys/values so far."""
+        x_attn = []
+        for h in range(self.n_head):
+            hs = h * self.head_dim
+            q_h = q[hs : hs + self.head_dim]
+            
+            # Causal attention: attend to past keys
+            # Flatten head logic slightly for clarity
+            k_h_past = [ki[hs : hs + self.head_dim] for ki in keys]
+            v_h_past = [vi[hs : hs + self.head_dim] for vi in values]
 
-    def export_graph(self, root):
-        """Differs from trace_graph by returning JSON-serializable structure"""
-        # Limit depth or nodes to avoid massive JSON
-        # For visualization, we might only want the immediate calculation of the loss for the last token
-        
-        _nodes, _edges = set(), set()
-        
-        # DFS with depth limit
-        visited = set()
-        
-        node_list = []
-        edge_list = []
-        
-        # Assign IDs
-        uid = 0
-        id_map = {}
-        
-        def get_id(v):
-            nonlocal uid
-            if v not in id_map:
-                id_map[v] = uid
-                uid += 1
-            return id_map[v]
-
-        def walk(v, depth):
-            if v in visited:
-                return
-            visited.add(v)
-            if depth > 10: # Only go 10 layers deep for visual sanity
-                 return
+            if self.fused_ops:
+                x_attn.extend(self.node_type.attention(q_h, k_h_past, v_h_past))
+                continue
             
-            node_id = get_id(v)
-            label = f"{v.data:.4f}"
-            if v._op:
-                label = f"{v._op} | " + label
+            # Attention scores
+            # (query . key) / sqrt(dim)
+            scale = self.head_dim ** -0.5
+            attn_logits = []
+            for t, k_vec in enumerate(k_h_past):
+                dot = _sum(q_h[j] * k_vec[j] for j in range(self.head_dim))
+                attn_logits.append(dot * scale)
             
-            node_list.append({
-                "id": node_id,
-                "label": label,
-                "op": v._op,
-                "data": v.data,
-                "grad": v.grad
-            })
+            attn_weights = self.softmax(attn_logits)
             
-            for child in v._children:
-                walk(child, depth + 1)
-                child_id = get_id(child)
-                edge_list.append({"from": child_id, "to": node_id})
-        
-        walk(root, 0)
-        return {"nodes": node_list, "edges": edge_list}
+            # Weighted sum of values
+            head_out = []
+            for j in range(self.head_dim):
+                # sum(weight[t] * val[t][j])
+                val = _sum(attn_weights[t] * v_h_past[t][j] for t in range(len(v_h_past)))
+                head_out.append(val)
+            x_attn.extend(head_out)
+        return x_attn
+
+    def _mlp(self, x, li):
+        x_residual = x
+        x = self.rmsnorm(x)
+        x = self.linear(x, self.state_dict[f'layer{li}.mlp_fc1'])
+        x = [xi.relu() for xi in x]
+        x = self.linear(x, self.state_dict[f'layer{li}.mlp_fc2'])
+        return [a + b for a, b in zip(x, x_residual)]
+
+    def forward_sequence(self, tokens, n):
+        """
+        Teacher-forced forward over positions ``0..n-1`` at once (training path).
+        Every target is known up front, so each layer runs over all positions
+        under a causal mask; ``gpt`` stays the incremental KV-cache path for sampling.
+        """
+        if self.backend == "numpy":
+            return self._forward_sequence_tensor(tokens[:n])
+
+        sd = self.state_dict
+        xs = [self.rmsnorm([t + p for t, p in zip(sd['wte'][token_id], sd['wpe'][pos_id])])
+              for pos_id, token_id in enumerate(tokens[:n])]
+
+        for li in range(self.n_layer):
+            x_residual = xs
+            xs = [self.rmsnorm(x) for x in xs]
+            q = [self.linear(x, sd[f'layer{li}.attn_wq']) for x in xs]
+            k = [self.linear(x, sd[f'layer{li}.attn_wk']) for x in xs]
+            v = [self.linear(x, sd[f'layer{li}.attn_wv']) for x in xs]
+
+            xs = [self.linear(self._attend(q[t], k[:t + 1], v[:t + 1]), sd[f'layer{li}.attn_wo']) for t in range(n)]
+            xs = [[a + b for a, b in zip(x, r)] for x, r in zip(xs, x_residual)]
+            xs = [self._mlp(x, li) for x in xs]
+
+        return [self.linear(x, sd['lm_head']) for x in xs]
+
+    def _gpt_tensor(self, token_id, pos_id, keys, values):
+        """Same network as ``gpt`` expressed as a handful of NumPy tensor ops."""
+        from . import tensor as T
+
+        sd = self.state_dict
+        n_head, head_dim = self.n_head, self.head_dim
+
+        x = T.rmsnorm(sd['wte'][token_id] + sd['wpe'][pos_id])
+
+        for li in range(self.n_layer):
+            # Attention
+            x_residual = x
+            x = T.rmsnorm(x)
+            q = T.linear(x, sd[f'layer{li}.attn_wq'])
+            keys[li].append(T.linear(x, sd[f'layer{li}.attn_wk']))
+            values[li].append(T.linear(x, sd[f'layer{li}.attn_wv']))
+
+            # (n_head, t, head_dim) views of the cached keys/values
+            k = T.stack(keys[li]).reshape(-1, n_head, head_dim).transpose(1, 0, 2)
+            v = T.stack(values[li]).reshape(-1, n_head, head_dim).transpose(1, 0, 2)
+            attn_logits = (q.reshape(n_head, 1, head_dim) @ k.transpose(0, 2, 1)) * (head_dim ** -0.5)
+            x = (T.softmax(attn_logits) @ v).reshape(self.n_embd)
+
+            x = T.linear(x, sd[f'layer{li}.attn_wo']) + x_residual
+
+            # MLP
+            x_residual = x
+            x = T.linear(T.rmsnorm(x), sd[f'layer{li}.mlp_fc1']).relu()
+            x = T.linear(x, sd[f'layer{li}.mlp_fc2']) + x_residual
+
+        return T.linear(x, sd['lm_head'])
+
+    def _forward_sequence_tensor(self, tokens, positions=None, segments=None):
+        """
+        ``forward_sequence`` as one batched call per layer. ``tokens`` is a
+        length-n list, giving (n, vocab) logits, or a (batch, n) array of
+        equal-length rows, giving (batch, n, vocab) logits.
+        Packed rows pass per-token ``positions`` and document ``segments``
+        (both (batch, n)); attention then stays inside each segment.
+        """
+        from . import tensor as T
+
+        sd = self.state_dict
+        tokens = np.asarray(tokens)
+        single = tokens.ndim == 1
+        tokens = tokens.reshape(-1, tokens.shape[-1])
+        (b, n), n_head, head_dim = tokens.shape, self.n_head, self.head_dim
+
+        def heads(t):  # (b, n, n_embd) -> (b, n_head, n, head_dim)
+            return t.reshape(b, n, n_head, head_dim).transpose(0, 2, 1, 3)
+
+        causal_mask = np.triu(np.full((n, n), -np.inf), k=1)
+        if segments is not None:
+            same_doc = segments[:, None, :, None] == segments[:, None, None, :]
+            causal_mask = np.where(same_doc, causal_mask, -np.inf)
+        causal_mask = T.Tensor(causal_mask)
+        pos_emb = sd['wpe'][:n] if positions is None else sd['wpe'][positions]
+        x = T.rmsnorm(sd['wte'][tokens] + pos_emb)
+
+        for li in range(self.n_layer):
+            # Attention
+            x_residual = x
+            x = T.rmsnorm(x)
+            q = heads(T.linear(x, sd[f'layer{li}.attn_wq']))
+            k = heads(T.linear(x, sd[f'layer{li}.attn_wk']))
+            v = heads(T.linear(x, sd[f'layer{li}.attn_wv']))
+            attn_logits = (q @ k.transpose(0, 1, 3, 2)) * (head_dim ** -0.5) + causal_mask
+            x = (T.softmax(attn_logits) @ v).transpose(0, 2, 1, 3).reshape(b, n, self.n_embd)
+            x = T.linear(x, sd[f'layer{li}.attn_wo']) + x_residual
+
+            # MLP
+            x_residual = x
+            x = T.linear(T.rmsnorm(x), sd[f'layer{li}.mlp_fc1']).relu()
+            x = T.linear(x, sd[f'layer{li}.mlp_fc2']) + x_residual
+
+        logits = T.linear(x, sd['lm_head'])
+        return logits.reshape(n, self.vocab_size) if single else logits
+
+    def _doc_loss(self, tokens, n):
+        """Mean next-token loss over the first ``n`` positions of ``tokens``."""
+        logits_seq = self.forward_sequence(tokens, n)
+
+        if self.backend == "numpy":
+            from . import tensor as T
+
+            return T.cross_entropy(logits_seq, tokens[1:n + 1])
+
+        step_losses = []
+        for pos_id, logits in enumerate(logits_seq):
+            target_id = tokens[pos_id + 1]
+            if self.fused_ops:
+                step_losses.append(self.node_type.log_softmax_nll(logits, target_id))
+                continue
+            probs = self.softmax(logits)
+            loss_t = -probs[target_id].log()
+            step_losses.append(loss_t)
+
+        return _sum(step_losses) * (1.0 / n)
+
+    def _doc_weights(self, batch):
+        """
+        ``(tokens, n, weight)`` for every document of ``batch``, a list of windows
+        (lists of ``(tokens, n)``). Packed batches average over predicted tokens,
+        unpacked ones over documents.
+        """
+        docs = [doc for window in batch for doc in window]
+        if self.pack_sequences:
+            total = sum(n for _, n in docs)
+            return [(tokens, n, n / total) for tokens, n in docs]
+        return [(tokens, n, 1.0 / len(docs)) for tokens, n in docs]
+
+    def _batch_loss(self, batch):
+        """Weighted sum of the document losses of ``batch`` (see ``_doc_weights``)."""
+        if self.backend == "numpy":
+            from . import tensor as T
+
+            # One row per window, right-padded to the fullest one. Positions and
+            # attention restart at each document; padding is its own segment
+            # with zero weight in the loss
+            width = max(sum(n for _, n in window) for window in batch)
+            shape = (len(batch), width)
+            inputs, targets = np.full(shape, self.BOS), np.full(shape, self.BOS)
+            positions, segments = np.zeros(shape, dtype=int), np.full(shape, -1)
+            weights = np.zeros(shape)
+            doc_weights = iter(self._doc_weights(batch))
+            for row, window in enumerate(batch):
+                col = 0
+                for seg, (tokens, n, w) in zip(range(len(window)), doc_weights):
+                    cols = slice(col, col + n)
+                    inputs[row, cols], targets[row, cols] = tokens[:n], tokens[1:n + 1]
+                    positions[row, cols], segments[row, cols] = range(n), seg
+                    weights[row, cols] = w / n
+                    col += n
+            logits = self._forward_sequence_tensor(inputs, positions, segments)
+            return T.cross_entropy(logits.reshape(-1, self.vocab_size), targets.ravel(), weights.ravel())
+
+        return _sum(self._doc_loss(tokens, n) * w for tokens, n, w in self._doc_weights(batch))
+
+    def _accumulate_grads(self, batch):
+        """Adds the gradient of ``_batch_loss(batch)`` to ``p.grad`` and returns the loss."""
+        if self.backend == "compiled":
+            from .compiler import compile_loss
+
+            # Straight from and into the flat buffers; the Value params only rebuild the page's graph
+            total = 0.0
+            flat = self.flat_data.tolist()
+            fns = []
+            with self._phase('train', 'compiled'):  # forward and backward are one generated function
+                for tokens, n, w in self._doc_weights(batch):
+                    fns.append(compile_loss(self, n))
+                    loss, grads = fns[-1](flat, tokens[:n + 1])
+                    total += loss * w
+                    self.flat_grad += w * np.array(grads)
+            if self.profiler:
+                # No nodes are allocated; count the traced graph each call evaluates (padded length)
+                for fn in fns:
+                    self.profiler.record_graph(fn.op_counts.elements())
+            return Value(total)
+
+        if self.backend == "soa":
+            self.graph.truncate(len(self.params))
+
+        # Scalar nodes are recorded on the tape; tensor graphs are small enough to walk
+        with self._phase('train', 'forward'), Tape() as tape:
+            loss = self._batch_loss(batch)
+        if self.profiler:
+            self.profiler.record_graph(self._graph_ops(loss, tape))
+        with self._phase('train', 'backward'):
+            if tape.nodes:
+                tape.backward(loss)
+            else:
+                loss.backward()
+        return loss
+
+    def _phase(self, *stack):
+        return self.profiler.phase(*stack) if self.profiler else contextlib.nullcontext()
+
+    def _graph_ops(self, loss, tape):
+        """Op name of every node built for ``loss`` (profiling only)."""
+        if self.backend == "soa":
+            return [OP_NAMES[o] for o in self.graph.op[len(self.params):]]
+        if self.backend != "numpy":
+            return [OP_NAMES[v._op] for v in tape.nodes]
+        ops, seen, stack = [], set(), [loss]
+        while stack:
+            v = stack.pop()
+            if id(v) not in seen and v._prev:
+                seen.add(id(v))
+                stack.extend(v._prev)
+                ops.append(v.op)
+        return ops
+
+    def _forward_backward(self, tokens, n):
+        """Computes the document loss and leaves its gradient in ``p.grad``."""
+        self.zero_grad()
+        return self._accumulate_grads([[(tokens, n)]])
+
+    def _doc_tokens(self, i):
+        # BOS + chars + BOS
+        return [self.BOS, *self.docs.tokens(i), self.BOS]
+
+    def make_loader(self):
+        """Micro-batch stream over ``docs`` for ``run`` (see ``DocumentLoader``)."""
+        from .loader import DocumentLoader
+
+        return DocumentLoader(len(self.docs), self._doc_tokens, self.block_size, batch_size=self.batch_size,
+                              pack=self.pack_sequences, prefetch=self.prefetch_batches, start=self.next_doc)
+
+    def save_checkpoint(self):
+        from . import checkpoint
+
+        checkpoint.save(self, self.checkpoint_file)
+
+    def load_checkpoint(self):
+        """Restores weights and optimizer state from ``checkpoint_file``; False if there is none to use."""
+        from . import checkpoint
+
+        return checkpoint.load(self, self.checkpoint_file)
+
+    def trace_graph(self, root):
+        nodes = set(topological_order(root))
+        edges = {(child, v) for v in nodes for child in v._prev}
+        return nodes, edges
+
+    def export_graph(self, root, max_nodes=None):
+        """
+        JSON-ready, columnar view of the ``max_nodes`` nodes nearest to ``root``.
+        Breadth-first from the loss, so the budget keeps the last operations
+        instead of one deep path; every node is visited at most once. Leaves
+        that are not parameters (constants) are merged by value. Node ``i`` is
+        ``op[i]`` (index into ``ops``), ``data[i]``, ``grad[i]``; edge ``j`` runs
+        from node ``src[j]`` to node ``dst[j]``.
+        """
+        max_nodes = self.graph_node_budget if max_nodes is None else max_nodes
+        params = set(self.params)
+        ops, op_index = [], {}
+        cols = {"op": [], "data": [], "grad": [], "param": []}
+        src, dst = [], []
+        ids = {}  # node (or ('const', value)) -> exported id
+        truncated = False
+
+        def key(v):
+            return ('const', _as_float(v.data)) if not v._prev and v not in params else v
+
+        def add(v):
+            k = key(v)
+            if k in ids:
+                return ids[k], False
+            if len(ids) >= max_nodes:
+                return None, False
+            ids[k] = len(ids)
+            op = v.op
+            if op not in op_index:
+                op_index[op] = len(ops)
+                ops.append(op)
+            cols["op"].append(op_index[op])
+            cols["data"].append(float(f"{_as_float(v.data):.6g}"))
+            cols["grad"].append(float(f"{_as_float(v.grad):.6g}"))
+            cols["param"].append(int(v in params))
+            return ids[k], True
+
+        queue = collections.deque([root])
+        add(root)
+        while queue:
+            v = queue.popleft()
+            v_id = ids[key(v)]
+            for child in v._prev:
+                child_id, new = add(child)
+                if child_id is None:
+                    truncated = True
+                    continue
+                src.append(child_id)
+                dst.append(v_id)
+                if new:
+                    queue.append(child)
+
+        return {"format": "columnar", "ops": ops, **cols, "src": src, "dst": dst, "truncated": truncated}
 
     def run(self):
         log.info("Starting MicroGPT training...")
         
+        from .profiler import Profiler
+
+        self.profiler = Profiler() if self.profile else None
         losses = []
+        if self.resume:
+            self.load_checkpoint()
+        start_step = self.optimizer.t
         
-        beta1, beta2, eps_adam = 0.85, 0.99, 1e-8
-        
-        # Training Loop
-        for step in range(self.num_steps):
-            doc = self.docs[step % len(self.docs)]
-            # Tokenize: BOS + chars + BOS
-            tokens = [self.BOS] + [self.uchars.index(ch) for ch in doc] + [self.BOS]
-            n = min(self.block_size, len(tokens) - 1)
-            
-            keys, values = [[] for _ in range(self.n_layer)], [[] for _ in range(self.n_layer)]
-            step_losses = []
-            
-            # Forward pass per token
-            for pos_id in range(n):
-                token_id, target_id = tokens[pos_id], tokens[pos_id + 1]
-                logits = self.gpt(token_id, pos_id, keys, values)
-                probs = self.softmax(logits)
-                loss_t = -probs[target_id].log()
-                step_losses.append(loss_t)
-            
-            loss = sum(step_losses, Value(0)) * (1.0 / n)
-            
-            # Backward
-            self.zero_grad() 
-            loss.backward()
-            
-            # Optimizer Step
-            lr_t = self.learning_rate * (1 - step / self.num_steps)
-            for i, p in enumerate(self.params):
-                self.m[i] = beta1 * self.m[i] + (1 - beta1) * p.grad
-                self.v[i] = beta2 * self.v[i] + (1 - beta2) * p.grad ** 2
-                m_hat = self.m[i] / (1 - beta1 ** (step + 1))
-                v_hat = self.v[i] / (1 - beta2 ** (step + 1))
-                p.data -= lr_t * m_hat / (v_hat ** 0.5 + eps_adam)
-            
-            losses.append({'step': step + 1, 'loss': loss.data})
-            if (step + 1) % 10 == 0:
-                log.info(f"Step {step+1}/{self.num_steps} | Loss: {loss.data:.4f}")
+        # Training Loop: num_steps, or as many steps as the time budget allows
+        from .budget import TrainingBudget, stop_on_sigterm
 
-        # Capture Generation
-        log.info("Generating samples...")
-        samples = []
-        temperature = 0.8
-        for _ in range(5):
-            keys, values = [[] for _ in range(self.n_layer)], [[] for _ in range(self.n_layer)]
-            token_id = self.BOS
-            sample_tokens = []
-            for pos_id in range(self.block_size):
-                logits = self.gpt(token_id, pos_id, keys, values)
-                probs = self.softmax([logit * (1.0 / temperature) for logit in logits])
+        budget = TrainingBudget(self.num_steps if not (self.time_budget or self.cpu_budget) else None,
+                                wall_seconds=self.time_budget, cpu_seconds=self.cpu_budget)
+        loader = self.make_loader()
+        batches = iter(loader)
+        with stop_on_sigterm(budget):
+            while budget.should_continue():
+                step = budget.steps
+                t0, c0 = time.perf_counter(), time.process_time()
+                with self._phase('train', 'data'):
+                    micro_batches = [next(batches) for _ in range(self.grad_accum_steps)]
+                self.next_doc += sum(len(window) for batch in micro_batches for window in batch)
                 
-                # Sample
-                p_data = [p.data for p in probs]
-                token_id = random.choices(range(self.vocab_size), weights=p_data)[0]
+                # Forward + Backward, gradients summed over the micro-batches
+                self.zero_grad()
+                step_loss = 0.0
+                for batch in micro_batches:
+                    loss = self._accumulate_grads(batch)
+                    step_loss += float(loss.data)
+                step_loss /= len(micro_batches)
                 
-                if token_id == self.BOS:
-                    break
-                sample_tokens.append(self.itos.get(token_id, '?'))
-            
-            samples.append("".join(sample_tokens))
+                # Optimizer Step (on the averaged gradient, over the flat buffer);
+                # the learning rate decays linearly over the step or time budget
+                lr_t = self.learning_rate * (1 - budget.progress())
+                with self._phase('train', 'optimizer'):
+                    self._gather_grads()
+                    rows = None
+                    if self.sparse_embeddings:
+                        # Only input tokens are looked up in wte, so only their rows have gradient
+                        rows = {'wte': list({t for batch in micro_batches for window in batch
+                                             for tokens, n in window for t in tokens[:n]})}
+                    self.optimizer.step(lr_t, grad_scale=1.0 / len(micro_batches), rows=rows)
+                    self._scatter_data()
+                if self.profiler:
+                    self.profiler.end_step()
+                
+                n_tokens = sum(n for batch in micro_batches for window in batch for _, n in window)
+                elapsed = time.perf_counter() - t0
+                budget.record_step(elapsed, time.process_time() - c0)
+                losses.append({
+                    'step': start_step + step + 1,
+                    'loss': step_loss,
+                    'tokens': n_tokens,
+                    'tokens_per_sec': n_tokens / elapsed if elapsed > 0 else 0.0,
+                    'step_time': elapsed,
+                })
+                if (step + 1) % 10 == 0:
+                    total = f"/{self.num_steps}" if budget.max_steps else ""
+                    log.info(f"Step {step+1}{total} | Loss: {step_loss:.4f} | "
+                             f"{losses[-1]['tokens_per_sec']:.0f} tok/s | "
+                             f"{budget.mean_step_time * 1000:.1f} ms/step | ETA {budget.eta():.1f}s")
+        train_time = budget.wall_elapsed()
+        log.info(f"Training stopped after {budget.steps} steps ({budget.stop_reason}) in {train_time:.1f}s")
+
+        loader.close()
+        # A plain run must not overwrite the checkpoint that --resume runs build on
+        if self.checkpoint_file and (self.resume or self.write_checkpoint):
+            self.save_checkpoint()
+
+        # Capture Generation
+        log.info("Generating samples...")
+        from .inference import sample
+
+        # All samples advance together over one batched KV cache, seeded from the run's RNG
+        rng = np.random.default_rng(random.getrandbits(64))
+        with self._phase('sample'):
+            sampled = sample(self, self.num_samples, self.temperature, self.top_k, self.top_p, rng)
+        samples = ["".join(self.itos.get(t, '?') for t in seq) for seq in sampled]
 
         # Capture Graph (of the last training step's loss)
         # We need to serialize a small part of the graph, or the whole thing is too huge.
         # Let's verify if 'loss' is still valid from the loop
-        graph_data = self.export_graph(loss) 
+        final_loss = losses[-1]['loss'] if losses else None  # JSON null; NaN is not valid JSON
+        if not losses:
+            # The budget ran out before the first step
+            graph_data = None
+        elif self.backend == "compiled":
+            # The compiled step keeps no graph; rebuild the last document's graph for the page
+            tokens, n = micro_batches[-1][-1][-1]
+            with Tape() as tape:
+                loss = self._doc_loss(tokens, n)
+            tape.backward(loss)
+        if losses:
+            with self._phase('export'):
+                graph_data = self.export_graph(loss)
         
         trace = {
-            'final_loss': loss.data,
+            'final_loss': final_loss,
             'loss_history': losses,
             'samples': samples,
             'vocab': self.uchars,
@@ -414,19 +1009,55 @@ class MicroGPTVisualizer:
                 'n_layer': self.n_layer,
                 'n_embd': self.n_embd,
                 'n_head': self.n_head,
-                'block_size': self.block_size
+                'block_size': self.block_size,
+                'batch_size': self.batch_size,
+                'pack_sequences': self.pack_sequences,
+                'grad_accum_steps': self.grad_accum_steps,
+                'sparse_embeddings': self.sparse_embeddings,
+                'start_step': start_step,
+                'steps': budget.steps,
+                'stop_reason': budget.stop_reason,
+                'train_time': train_time,
+                'backend': self.backend
             }
         }
+        if self.profiler:
+            trace['profile'] = self.profiler.summary()
+            log.info("Profile:\n" + self.profiler.table())
+            if self.profile_file:
+                self.profiler.write_collapsed(self.profile_file)
+                log.info(f"Collapsed stacks saved to {self.profile_file}")
         
-        with open(self.trace_file, 'w', encoding='utf-8') as f:
-            json.dump(trace, f, indent=2)
-            
-        log.info(f"Trace saved to {self.trace_file}")
+        if self.trace_file:  # None for sweep workers, which report back instead
+            with open(self.trace_file, 'w', encoding='utf-8') as f:
+                # Streamed straight to the file, without indentation
+                json.dump(trace, f, separators=(',', ':'))
+            log.info(f"Trace saved to {self.trace_file}")
         return trace
 
     def zero_grad(self):
-        for p in self.params:
-            p.grad = 0
+        self.flat_grad.fill(0)
+        if self.backend == "soa":
+            n = len(self.params)
+            self.graph.grad[:n] = array('d', bytes(8 * n))
+        elif self.backend == "scalar":
+            for p in self.params:
+                p.grad = 0
+
+    def _gather_grads(self):
+        """Copies per-node parameter gradients into ``flat_grad`` (NumPy/compiled write it directly)."""
+        if self.backend == "soa":
+            self.flat_grad[:] = np.frombuffer(self.graph.grad, count=len(self.params))
+        elif self.backend == "scalar":
+            self.flat_grad[:] = [p.grad for p in self.params]
+
+    def _scatter_data(self):
+        """Copies ``flat_data`` back into per-node parameters (NumPy tensors are views already)."""
+        if self.backend == "soa":
+            self.graph.data[:len(self.params)] = array('d', self.flat_data.tobytes())
+        elif self.backend != "numpy":
+            for p, x in zip(self.params, self.flat_data.tolist()):
+                p.data = x
 
 if __name__ == '__main__':
     viz = MicroGPTVisualizer()
@@ -0,0 +1,271 @@
+"""
+MicroGPT Graph Store
+- Struct-of-arrays alternative to one Python object per ``Value``.
+- Every node is a row in parallel ``array`` buffers (data, grad, op code,
+  parent offsets), about 30 bytes per node instead of a few hundred.
+- ``Node`` is a two-slot facade with the ``Value`` interface, so ``gpt()``
+  and ``export_graph`` run unchanged on top of it.
+"""
+
+import math
+from array import array
+
+from .engine import (
+    ADD,
+    ATTN,
+    DOT,
+    EXP,
+    LEAF,
+    LOG,
+    MUL,
+    NLL,
+    OP_NAMES,
+    POW,
+    RELU,
+    RMS,
+    attention_grads,
+    attention_weights,
+    softmax_floats,
+)
+
+
+class Graph:
+    """
+    Append-only node store. Node ``i`` has ``data[i]``, ``grad[i]``, ``op[i]``
+    and parents ``parents[start[i]:start[i + 1]]``; nodes are appended in
+    creation order, so backward is a reverse index loop.
+    """
+
+    def __init__(self):
+        self.data = array('d')
+        self.grad = array('d')
+        self.op = array('b')
+        self.start = array('i', [0])
+        self.parents = array('i')
+        self._consts = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        return sum(buf.itemsize * len(buf) for buf in (self.data, self.grad, self.op, self.start, self.parents))
+
+    def _push(self, value, op, parents=()):
+        self.data.append(value)
+        self.grad.append(0.0)
+        self.op.append(op)
+        self.parents.extend(parents)
+        self.start.append(len(self.parents))
+        return len(self.data) - 1
+
+    def leaf(self, value):
+        return Node(self, self._push(value, LEAF))
+
+    def const(self, value):
+        """Index of a shared leaf for the number ``value`` (see ``engine.const``)."""
+        i = self._consts.get(value)
+        if i is None:
+            i = self._consts[value] = self._push(value, LEAF)
+        return i
+
+    def truncate(self, n):
+        """Drops every node after the first ``n`` (e.g. keeps only the parameters)."""
+        del self.data[n:]
+        del self.grad[n:]
+        del self.op[n:]
+        del self.parents[self.start[n]:]
+        del self.start[n + 1:]
+        self._consts = {k: i for k, i in self._consts.items() if i < n}
+
+    def backward(self, root):
+        data, grad, op, start, parents = self.data, self.grad, self.op, self.start, self.parents
+        grad[root] = 1.0
+        for i in range(root, -1, -1):
+            o, g = op[i], grad[i]
+            if o == LEAF or g == 0:
+                continue
+            s = start[i]
+            if o == ADD:
+                grad[parents[s]] += g
+                grad[parents[s + 1]] += g
+            elif o == MUL:
+                a, b = parents[s], parents[s + 1]
+                grad[a] += data[b] * g
+                grad[b] += data[a] * g
+            elif o == POW:
+                a, k = parents[s], data[parents[s + 1]]
+                grad[a] += (k * data[a]**(k-1)) * g
+            elif o == EXP:
+                grad[parents[s]] += data[i] * g
+            elif o == LOG:
+                a = parents[s]
+                grad[a] += (1/data[a]) * g
+            elif o == RELU:
+                grad[parents[s]] += (data[i] > 0) * g
+            elif o == DOT:
+                n = (start[i + 1] - s) // 2
+                for k in range(s, s + n):
+                    a, b = parents[k], parents[k + n]
+                    grad[a] += data[b] * g
+                    grad[b] += data[a] * g
+            elif o == RMS:
+                e = start[i + 1]
+                c = -data[i]**3 / (e - s) * g
+                for k in range(s, e):
+                    a = parents[k]
+                    grad[a] += c * data[a]
+            elif o == NLL:
+                # parents: logits..., target (as a constant leaf)
+                e = start[i + 1] - 1
+                logits = parents[s:e]
+                probs = softmax_floats([data[a] for a in logits])
+                probs[int(data[parents[e]])] -= 1
+                for a, p in zip(logits, probs):
+                    grad[a] += p * g
+            elif o == ATTN:
+                # parents: q (d), keys (t * d), value column (t), d (as a constant leaf)
+                e = start[i + 1] - 1
+                d = int(data[parents[e]])
+                t = (e - s - d) // (d + 1)
+                q = [data[a] for a in parents[s:s + d]]
+                keys = [[data[a] for a in parents[s + d + r * d:s + d + (r + 1) * d]] for r in range(t)]
+                col = [data[a] for a in parents[e - t:e]]
+                gq, gk, gv = attention_grads(q, keys, col, attention_weights(q, keys), g)
+                for a, ga in zip(parents[s:e], (*gq, *(x for row in gk for x in row), *gv)):
+                    grad[a] += ga
+
+
+class Node:
+    """``Value``-compatible handle on one row of a ``Graph``."""
+    __slots__ = ('graph', 'index')
+
+    def __init__(self, graph, index):
+        self.graph = graph
+        self.index = index
+
+    def __repr__(self):
+        return f"Node(data={self.data}, grad={self.grad})"
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.graph is other.graph and self.index == other.index
+
+    def __hash__(self):
+        return self.index
+
+    @property
+    def data(self):
+        return self.graph.data[self.index]
+
+    @data.setter
+    def data(self, value):
+        self.graph.data[self.index] = value
+
+    @property
+    def grad(self):
+        return self.graph.grad[self.index]
+
+    @grad.setter
+    def grad(self, value):
+        self.graph.grad[self.index] = value
+
+    @property
+    def _op(self):
+        return self.graph.op[self.index]
+
+    @property
+    def _prev(self):
+        g, i = self.graph, self.index
+        return tuple(Node(g, j) for j in g.parents[g.start[i]:g.start[i + 1]])
+
+    @property
+    def op(self):
+        if self._op == POW:
+            return f'**{self._prev[1].data:g}'
+        return OP_NAMES[self._op]
+
+    def _operand(self, other):
+        return other.index if isinstance(other, Node) else self.graph.const(other)
+
+    def _new(self, value, op, parents):
+        return Node(self.graph, self.graph._push(value, op, parents))
+
+    def __add__(self, other):
+        j = self._operand(other)
+        return self._new(self.data + self.graph.data[j], ADD, (self.index, j))
+
+    def __mul__(self, other):
+        j = self._operand(other)
+        return self._new(self.data * self.graph.data[j], MUL, (self.index, j))
+
+    def __pow__(self, other):
+        assert isinstance(other, (int, float)), "only supporting int/float powers for now"
+        return self._new(self.data**other, POW, (self.index, self.graph.const(other)))
+
+    def exp(self):
+        return self._new(math.exp(self.data), EXP, (self.index,))
+
+    def log(self):
+        return self._new(math.log(self.data), LOG, (self.index,))
+
+    def relu(self):
+        x = self.data
+        return self._new(0 if x < 0 else x, RELU, (self.index,))
+
+    # --- Fused ops (one row each, see ``Value``) ---
+
+    @staticmethod
+    def dot(ws, xs):
+        g = ws[0].graph
+        return Node(g, g._push(sum(w.data * x.data for w, x in zip(ws, xs)), DOT,
+                               [w.index for w in ws] + [x.index for x in xs]))
+
+    @staticmethod
+    def rms_scale(xs, eps=1e-5):
+        g = xs[0].graph
+        value = (sum(x.data * x.data for x in xs) / len(xs) + eps) ** -0.5
+        return Node(g, g._push(value, RMS, [x.index for x in xs]))
+
+    @staticmethod
+    def attention(q, keys, values):
+        g = q[0].graph
+        d = len(q)
+        weights = attention_weights([x.data for x in q], [[x.data for x in k] for k in keys])
+        head = [x.index for x in q] + [x.index for k in keys for x in k]
+        out = []
+        for j in range(d):
+            col = [v[j] for v in values]
+            value = sum(w * v.data for w, v in zip(weights, col))
+            out.append(Node(g, g._push(value, ATTN, head + [v.index for v in col] + [g.const(d)])))
+        return out
+
+    @staticmethod
+    def log_softmax_nll(logits, target):
+        g = logits[0].graph
+        m = max(x.data for x in logits)
+        lse = m + math.log(sum(math.exp(x.data - m) for x in logits))
+        return Node(g, g._push(lse - logits[target].data, NLL, [x.index for x in logits] + [g.const(target)]))
+
+    def backward(self):
+        self.graph.backward(self.index)
+
+    def __neg__(self): # -self
+        return self * -1
+
+    def __radd__(self, other): # other + self
+        return self + other
+
+    def __sub__(self, other): # self - other
+        return self + (-other)
+
+    def __rsub__(self, other): # other - self
+        return other + (-self)
+
+    def __rmul__(self, other): # other * self
+        return self * other
+
+    def __truediv__(self, other): # self / other
+        return self * other**-1
+
+    def __rtruediv__(self, other): # other / self
+        return other * self**-1
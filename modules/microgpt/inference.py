@@ -0,0 +1,118 @@
+"""
+MicroGPT Inference
+- Graph-free forward pass for sampling: plain float64 arrays, no autograd
+  nodes, no closures.
+- Keys and values go into a ``KVCache`` preallocated for ``block_size``
+  positions, so generation allocates almost nothing.
+- ``sample`` advances many sequences in lockstep with vectorized
+  temperature / top-k / top-p sampling.
+- Weights are read from views into the model's flat parameter buffer, so
+  every backend samples from its current parameters without a copy.
+"""
+
+import numpy as np
+
+
+class KVCache:
+    """Per-layer keys and values for ``batch_size`` sequences and positions ``0..block_size-1``."""
+
+    def __init__(self, n_layer, block_size, n_embd, batch_size=1):
+        self.keys = np.zeros((n_layer, batch_size, block_size, n_embd))
+        self.values = np.zeros((n_layer, batch_size, block_size, n_embd))
+
+    @classmethod
+    def for_model(cls, model, batch_size=1):
+        return cls(model.n_layer, model.block_size, model.n_embd, batch_size)
+
+
+def rmsnorm(x, eps=1e-5):
+    return x * (np.mean(x * x, axis=-1, keepdims=True) + eps) ** -0.5
+
+
+def softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def forward_tokens(model, token_ids, pos_id, cache):
+    """
+    Logits (batch, vocab_size) for a batch of sequences that are all at
+    ``pos_id``. Writes this position's keys and values into ``cache`` and
+    attends over positions ``0..pos_id``; earlier positions must already be cached.
+    """
+    w = model.weights
+    n_head, head_dim = model.n_head, model.head_dim
+    b, t = len(token_ids), pos_id + 1
+
+    x = rmsnorm(w['wte'][token_ids] + w['wpe'][pos_id])
+    for li in range(model.n_layer):
+        # Attention
+        x_residual = x
+        x = rmsnorm(x)
+        q = (x @ w[f'layer{li}.attn_wq'].T).reshape(b, n_head, head_dim)
+        cache.keys[li, :b, pos_id] = x @ w[f'layer{li}.attn_wk'].T
+        cache.values[li, :b, pos_id] = x @ w[f'layer{li}.attn_wv'].T
+        keys = cache.keys[li, :b, :t].reshape(b, t, n_head, head_dim)
+        values = cache.values[li, :b, :t].reshape(b, t, n_head, head_dim)
+        weights = softmax(np.einsum('bhd,bthd->bht', q, keys) * head_dim ** -0.5)
+        x = np.einsum('bht,bthd->bhd', weights, values).reshape(b, -1) @ w[f'layer{li}.attn_wo'].T + x_residual
+
+        # MLP
+        x_residual = x
+        x = np.maximum(rmsnorm(x) @ w[f'layer{li}.mlp_fc1'].T, 0)
+        x = x @ w[f'layer{li}.mlp_fc2'].T + x_residual
+
+    return x @ w['lm_head'].T
+
+
+def forward_token(model, token_id, pos_id, cache):
+    """``forward_tokens`` for a single sequence: logits of length ``vocab_size``."""
+    return forward_tokens(model, [token_id], pos_id, cache)[0]
+
+
+def next_token_probs(logits, temperature=1.0, top_k=None, top_p=None):
+    """
+    Row-wise sampling distribution for (batch, vocab) ``logits``: temperature,
+    then top-k (keep the k largest logits), then nucleus/top-p (keep the
+    smallest set of tokens whose probability mass reaches ``top_p``).
+    """
+    logits = logits * (1.0 / temperature)
+    if top_k is not None and top_k < logits.shape[-1]:
+        kth = np.partition(logits, -top_k, axis=-1)[:, -top_k, None]
+        logits = np.where(logits < kth, -np.inf, logits)
+    probs = softmax(logits)
+    if top_p is not None and top_p < 1.0:
+        order = np.argsort(-probs, axis=-1)
+        sorted_probs = np.take_along_axis(probs, order, axis=-1)
+        keep = np.cumsum(sorted_probs, axis=-1) - sorted_probs < top_p  # the top token is always kept
+        mask = np.zeros_like(keep)
+        np.put_along_axis(mask, order, keep, axis=-1)
+        probs = np.where(mask, probs, 0.0)
+        probs /= probs.sum(axis=-1, keepdims=True)
+    return probs
+
+
+def sample(model, num_samples, temperature=1.0, top_k=None, top_p=None, rng=None):
+    """
+    Generates ``num_samples`` sequences in lockstep from BOS over one batched
+    KV cache. A sequence stops at its first sampled BOS (not included) or at
+    ``block_size`` tokens. Returns lists of token ids.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    cache = KVCache.for_model(model, num_samples)
+    token_ids = np.full(num_samples, model.BOS)
+    done = np.zeros(num_samples, dtype=bool)
+    out = [[] for _ in range(num_samples)]
+
+    for pos_id in range(model.block_size):
+        probs = next_token_probs(forward_tokens(model, token_ids, pos_id, cache), temperature, top_k, top_p)
+        # Inverse-CDF draw, one uniform per sequence
+        cdf = np.cumsum(probs, axis=-1)
+        token_ids = np.minimum((cdf < rng.random(num_samples)[:, None] * cdf[:, -1:]).sum(axis=-1),
+                               model.vocab_size - 1)
+        done |= token_ids == model.BOS
+        if done.all():
+            break
+        for i in np.flatnonzero(~done):
+            out[i].append(int(token_ids[i]))
+    return out
@@ -14,7 +14,7 @@ def register_jobs(registry):
         name="microgpt_train",
         description="Run MicroGPT training and generate visualization",
         schedule="0 10 * * *", # Example: Run once a day at 10 AM if enabled
-        command="apps.cli run microgpt",
+        command="apps.cli run microgpt --resume",  # daily runs keep improving one model
         tags=["microgpt"],
         enabled=enabled,
     ))
@@ -0,0 +1,100 @@
+"""
+MicroGPT Data Loader
+- Streams the (shuffled) names corpus as micro-batches of context windows.
+- With packing, several BOS-delimited names share one ``block_size`` window;
+  attention and positions restart at every document boundary, so a packed
+  window computes exactly the losses of its documents run one by one.
+- A background thread tokenizes and packs the next batches while the
+  current step trains.
+"""
+
+import queue
+import threading
+
+from core.logger import get_logger
+
+log = get_logger("microgpt.loader")
+
+
+class DocumentLoader:
+    """
+    Iterator over micro-batches: lists of ``batch_size`` windows, each window a
+    list of ``(tokens, n)`` documents with ``sum(n) <= block_size``.
+    ``tokens`` is BOS + chars + BOS and ``n`` the number of predicted positions.
+    """
+
+    def __init__(self, n_docs, doc_tokens, block_size, batch_size=1, pack=True, prefetch=2, start=0):
+        self.n_docs = n_docs
+        self.doc_tokens = doc_tokens
+        self.block_size = block_size
+        self.batch_size = batch_size
+        self.pack = pack
+        self.prefetch = prefetch
+        self.start = start
+
+        self._queue = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def _windows(self):
+        """Endless stream of windows, cycling through the documents in order from ``start``."""
+        window, used, i = [], 0, self.start
+        while True:
+            tokens = self.doc_tokens(i % self.n_docs)
+            i += 1
+            n = min(self.block_size, len(tokens) - 1)
+            if window and (not self.pack or used + n > self.block_size):
+                yield window
+                window, used = [], 0
+            window.append((tokens, n))
+            used += n
+
+    def _batches(self):
+        windows = self._windows()
+        while True:
+            yield [next(windows) for _ in range(self.batch_size)]
+
+    def __iter__(self):
+        if self.prefetch <= 0:
+            return self._batches()
+        self.close()
+        self._stop_event.clear()
+        self._queue = queue.Queue(maxsize=self.prefetch)
+        self._thread = threading.Thread(target=self._produce, name="microgpt-loader", daemon=True)
+        self._thread.start()
+        return self._consume()
+
+    def _put(self, item):
+        """Queues ``item`` unless ``close()`` is called first; returns whether it was queued."""
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for batch in self._batches():
+                if not self._put(batch):
+                    return
+        except Exception as e:
+            log.error(f"Loader thread failed: {e}")
+            self._put(e)
+
+    def _consume(self):
+        while True:
+            batch = self._queue.get()
+            if isinstance(batch, Exception):
+                raise batch
+            yield batch
+
+    def close(self):
+        """Stops the prefetch thread, if one is running."""
+        if self._thread is not None:
+            self._stop_event.set()
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._thread.join()
+            self._thread = None
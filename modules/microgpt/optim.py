@@ -0,0 +1,78 @@
+"""
+MicroGPT Optimizer
+- Adam / AdamW over one flat, contiguous float64 parameter buffer.
+- A step is a handful of whole-buffer NumPy ops; bias corrections are
+  computed once per step instead of once per parameter.
+- Optional lazy (sparse) mode for embedding tables: only the rows that got
+  gradient are updated, each with its own step count for bias correction.
+"""
+
+import numpy as np
+
+
+class Adam:
+    """
+    Updates ``data`` in place from ``grad`` (both flat float64 arrays).
+    ``weight_decay > 0`` gives AdamW: decoupled decay of the weights themselves.
+    ``sparse`` maps a table name to ``(offset, n_rows, n_cols)`` inside the
+    buffer; those rows are updated lazily (see ``step``).
+    """
+
+    def __init__(self, data, grad, betas=(0.85, 0.99), eps=1e-8, weight_decay=0.0, sparse=None):
+        self.data = data
+        self.grad = grad
+        self.beta1, self.beta2 = betas
+        self.eps = eps
+        self.weight_decay = weight_decay
+        self.m = np.zeros_like(data)
+        self.v = np.zeros_like(data)
+        self.t = 0
+
+        self.sparse = dict(sparse or {})
+        self.row_steps = {name: np.zeros(n_rows, dtype=np.int64) for name, (_, n_rows, _) in self.sparse.items()}
+        # Dense updates run on the contiguous spans between the sparse tables
+        spans, start = [], 0
+        for offset, n_rows, n_cols in sorted(self.sparse.values()):
+            spans.append(slice(start, offset))
+            start = offset + n_rows * n_cols
+        spans.append(slice(start, len(data)))
+        self._dense = [s for s in spans if s.stop > s.start]
+
+    def step(self, lr, grad_scale=1.0, rows=None):
+        """
+        One update with learning rate ``lr`` on ``grad * grad_scale``.
+        ``rows`` maps a sparse table to the row ids that received gradient this
+        step; tables left out are scanned for non-zero gradient rows instead.
+        """
+        self.t += 1
+        for s in self._dense:
+            g = self.grad[s] * grad_scale if grad_scale != 1.0 else self.grad[s]
+            self._update(self.data[s], g, self.m[s], self.v[s], self.t, lr)
+
+        rows = rows or {}
+        for name, (offset, n_rows, n_cols) in self.sparse.items():
+            span = slice(offset, offset + n_rows * n_cols)
+            data, grad, m, v = (buf[span].reshape(n_rows, n_cols) for buf in (self.data, self.grad, self.m, self.v))
+            idx = rows.get(name)
+            idx = np.flatnonzero(grad.any(axis=1)) if idx is None else np.unique(np.asarray(idx, dtype=np.int64))
+            if not idx.size:
+                continue
+            steps = self.row_steps[name]
+            steps[idx] += 1
+            d, m_rows, v_rows = data[idx], m[idx], v[idx]
+            self._update(d, grad[idx] * grad_scale, m_rows, v_rows, steps[idx][:, None], lr)
+            data[idx], m[idx], v[idx] = d, m_rows, v_rows
+
+    def _update(self, data, g, m, v, t, lr):
+        """In-place Adam(W) on matching arrays; ``t`` is a step count or a column of per-row counts."""
+        beta1, beta2 = self.beta1, self.beta2
+        m *= beta1
+        m += (1 - beta1) * g
+        v *= beta2
+        v += (1 - beta2) * np.square(g)
+
+        if self.weight_decay:
+            data -= (lr * self.weight_decay) * data
+        m_hat = m / (1 - beta1 ** t)
+        v_hat = v / (1 - beta2 ** t)
+        data -= lr * m_hat / (np.sqrt(v_hat) + self.eps)
@@ -0,0 +1,72 @@
+"""
+MicroGPT Profiler (opt-in, ``MicroGPTVisualizer.profile = True``)
+- Wall time per phase of a training step (data, forward, backward,
+  optimizer) and of the run (sample, export).
+- Autograd allocation counters: nodes created per op type, nodes per step
+  and the peak size of a single step's graph.
+- Output as a summary dict (embedded in ``trace.json``), a text table for
+  the log and a collapsed-stack file (``frame;frame value`` lines, in
+  microseconds) for flamegraph tools.
+"""
+
+import collections
+import contextlib
+import time
+
+
+class Profiler:
+
+    def __init__(self):
+        self.phase_time = collections.defaultdict(float)  # ('train', 'forward') -> seconds
+        self.op_counts = collections.Counter()  # op name -> nodes created
+        self.nodes_per_step = []
+        self.peak_graph_nodes = 0
+        self._step_nodes = 0
+
+    @contextlib.contextmanager
+    def phase(self, *stack):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_time[stack] += time.perf_counter() - t0
+
+    def record_graph(self, op_names):
+        """Counts the nodes of one forward graph, given as an iterable of op names."""
+        counts = collections.Counter(op_names)
+        n = sum(counts.values())
+        self.op_counts.update(counts)
+        self._step_nodes += n
+        self.peak_graph_nodes = max(self.peak_graph_nodes, n)
+
+    def end_step(self):
+        self.nodes_per_step.append(self._step_nodes)
+        self._step_nodes = 0
+
+    def summary(self):
+        steps = len(self.nodes_per_step)
+        return {
+            'steps': steps,
+            'phases': {';'.join(stack): seconds for stack, seconds in sorted(self.phase_time.items())},
+            'op_counts': dict(self.op_counts.most_common()),
+            'nodes_per_step': sum(self.nodes_per_step) / steps if steps else 0,
+            'peak_graph_nodes': self.peak_graph_nodes,
+        }
+
+    def table(self):
+        """Human-readable cost breakdown for the log."""
+        total = sum(self.phase_time.values()) or 1.0
+        lines = [f"{'phase':<24}{'seconds':>10}{'share':>8}"]
+        for stack, seconds in sorted(self.phase_time.items(), key=lambda kv: -kv[1]):
+            lines.append(f"{'/'.join(stack):<24}{seconds:>10.4f}{seconds / total:>8.1%}")
+        lines.append(f"{'op':<24}{'nodes':>10}")
+        for op, count in self.op_counts.most_common():
+            lines.append(f"{op or 'leaf':<24}{count:>10}")
+        summary = self.summary()
+        lines.append(f"nodes/step {summary['nodes_per_step']:.0f} | peak graph {summary['peak_graph_nodes']} nodes")
+        return "\n".join(lines)
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, seconds in sorted(self.phase_time.items()):
+                f.write(f"microgpt;{';'.join(stack)} {round(seconds * 1e6)}\n")
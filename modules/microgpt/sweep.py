@@ -0,0 +1,95 @@
+"""
+MicroGPT Hyperparameter Sweep
+- Trains every combination of a parameter grid in parallel, one
+  configuration per worker process (``ProcessPoolExecutor``).
+- Configuration ``i`` of the (sorted, deterministic) grid always trains with
+  seed ``seed + i``, so results do not depend on worker scheduling.
+- Collects final loss, wall time and tokens/sec into one comparison trace,
+  ``data/microgpt/sweep.json``.
+"""
+
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from core.logger import get_logger
+
+from .engine import MicroGPTVisualizer, default_data_dir, load_corpus
+
+log = get_logger("microgpt.sweep")
+
+
+def expand_grid(grid):
+    """``{'n_embd': [16, 32], 'n_layer': [1]}`` -> one dict per combination, keys sorted."""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _train(backend, params, seed, data_dir):
+    """Worker: one full training run; writes no trace or checkpoint of its own."""
+    t0 = time.perf_counter()
+    viz = MicroGPTVisualizer(backend=backend, params=params, seed=seed, data_dir=data_dir, write_files=False)
+    trace = viz.run()
+    wall_time = time.perf_counter() - t0
+
+    history = trace['loss_history']
+    tokens = sum(h['tokens'] for h in history)
+    train_time = sum(h['tokens'] / h['tokens_per_sec'] for h in history if h['tokens_per_sec'])
+    return {
+        'params': params,
+        'seed': seed,
+        'final_loss': trace['final_loss'],
+        'wall_time': wall_time,
+        'tokens_per_sec': tokens / train_time if train_time else 0.0,
+        'loss_history': [h['loss'] for h in history],
+        'samples': trace['samples'],
+    }
+
+
+def run_sweep(grid, backend="numpy", workers=None, seed=0, base_params=None, data_dir=None, out_file=None):
+    """
+    Trains ``base_params`` updated with each grid combination and writes the
+    comparison trace to ``out_file`` (default ``data_dir/sweep.json``).
+    ``workers`` defaults to one process per CPU core.
+    """
+    configs = [dict(base_params or {}, **combo) for combo in expand_grid(grid)]
+    workers = min(workers or os.cpu_count() or 1, len(configs))
+
+    # Build the token cache once here so workers only ever read it
+    data_dir = data_dir or default_data_dir()
+    data_dir.mkdir(parents=True, exist_ok=True)
+    load_corpus(data_dir)
+    log.info(f"Sweeping {len(configs)} configurations on {workers} workers...")
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_train, backend, params, seed + i, data_dir) for i, params in enumerate(configs)]
+        runs = [f.result() for f in futures]
+    wall_time = time.perf_counter() - t0
+
+    def loss(run):  # a run whose time budget allowed no step has no loss (None) and never wins
+        return math.inf if run['final_loss'] is None else run['final_loss']
+
+    best = min(range(len(runs)), key=lambda i: loss(runs[i]))
+    for run in runs:
+        log.info(f"{run['params']} | loss {loss(run):.4f} | {run['wall_time']:.1f}s | "
+                 f"{run['tokens_per_sec']:.0f} tok/s")
+    log.info(f"Best: {runs[best]['params']} (loss {loss(runs[best]):.4f}) in {wall_time:.1f}s")
+
+    trace = {
+        'backend': backend,
+        'workers': workers,
+        'seed': seed,
+        'grid': grid,
+        'wall_time': wall_time,
+        'best': best,
+        'runs': runs,
+    }
+    out_file = out_file or data_dir / "sweep.json"
+    with open(out_file, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, indent=2)
+    log.info(f"Sweep trace saved to {out_file}")
+    return trace
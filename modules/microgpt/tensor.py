@@ -0,0 +1,233 @@
+"""
+MicroGPT Tensor Engine
+- NumPy counterpart of the scalar ``Value`` autograd engine.
+- One node per array operation instead of one node per scalar, so a forward
+  pass records tens of nodes rather than hundreds of thousands.
+"""
+
+import numpy as np
+
+from . import engine
+
+
+def _unbroadcast(grad, shape):
+    """Sums ``grad`` back down to ``shape`` after NumPy broadcasting."""
+    while grad.ndim > len(shape):
+        grad = grad.sum(axis=0)
+    for axis, size in enumerate(shape):
+        if size == 1 and grad.shape[axis] != 1:
+            grad = grad.sum(axis=axis, keepdims=True)
+    return grad
+
+
+def _attach(out, backward):
+    """Gives ``out`` its backward closure, unless it was made under ``engine.no_grad`` (then it has no parents)."""
+    if out._prev:
+        out._backward = backward
+    return out
+
+
+class Tensor:
+    """
+    Stores an n-dimensional float64 array and its gradient.
+    Mirrors the ``Value`` interface (data, grad, backward) so the trainer can
+    treat both engines the same way.
+    """
+    __slots__ = ('data', 'grad', '_prev', '_op', '_backward')
+
+    def __init__(self, data, _prev=(), _op=''):
+        self.data = np.asarray(data, dtype=np.float64)
+        self.grad = 0
+        if not engine.is_grad_enabled():
+            _prev, _op = (), ''  # see ``engine.no_grad``; ``_attach`` then drops the backward closure
+        self._prev = _prev
+        self._op = _op
+        self._backward = None
+
+    def __repr__(self):
+        return f"Tensor(shape={self.data.shape})"
+
+    @property
+    def op(self):
+        return self._op
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def __add__(self, other):
+        other = other if isinstance(other, Tensor) else Tensor(other)
+        out = Tensor(self.data + other.data, (self, other), '+')
+
+        def _backward():
+            self.grad += _unbroadcast(out.grad, self.data.shape)
+            other.grad += _unbroadcast(out.grad, other.data.shape)
+        return _attach(out, _backward)
+
+    def __mul__(self, other):
+        other = other if isinstance(other, Tensor) else Tensor(other)
+        out = Tensor(self.data * other.data, (self, other), '*')
+
+        def _backward():
+            self.grad += _unbroadcast(other.data * out.grad, self.data.shape)
+            other.grad += _unbroadcast(self.data * out.grad, other.data.shape)
+        return _attach(out, _backward)
+
+    def __matmul__(self, other):
+        out = Tensor(self.data @ other.data, (self, other), '@')
+
+        def _backward():
+            self.grad += _unbroadcast(out.grad @ np.swapaxes(other.data, -1, -2), self.data.shape)
+            other.grad += _unbroadcast(np.swapaxes(self.data, -1, -2) @ out.grad, other.data.shape)
+        return _attach(out, _backward)
+
+    def __getitem__(self, idx):
+        out = Tensor(self.data[idx], (self,), 'gather')
+
+        def _backward():
+            grad = np.zeros_like(self.data)
+            np.add.at(grad, idx, out.grad)
+            self.grad += grad
+        return _attach(out, _backward)
+
+    def exp(self):
+        out = Tensor(np.exp(self.data), (self,), 'exp')
+
+        def _backward():
+            self.grad += out.data * out.grad
+        return _attach(out, _backward)
+
+    def log(self):
+        out = Tensor(np.log(self.data), (self,), 'log')
+
+        def _backward():
+            self.grad += out.grad / self.data
+        return _attach(out, _backward)
+
+    def relu(self):
+        out = Tensor(np.maximum(self.data, 0), (self,), 'ReLU')
+
+        def _backward():
+            self.grad += (out.data > 0) * out.grad
+        return _attach(out, _backward)
+
+    def sum(self, axis=None, keepdims=False):
+        out = Tensor(self.data.sum(axis=axis, keepdims=keepdims), (self,), 'sum')
+
+        def _backward():
+            grad = out.grad
+            if axis is not None and not keepdims:
+                grad = np.expand_dims(grad, axis)
+            self.grad += np.broadcast_to(grad, self.data.shape)
+        return _attach(out, _backward)
+
+    def reshape(self, *shape):
+        out = Tensor(self.data.reshape(*shape), (self,), 'reshape')
+
+        def _backward():
+            self.grad += out.grad.reshape(self.data.shape)
+        return _attach(out, _backward)
+
+    def transpose(self, *axes):
+        out = Tensor(self.data.transpose(*axes), (self,), 'transpose')
+
+        def _backward():
+            self.grad += out.grad.transpose(np.argsort(axes))
+        return _attach(out, _backward)
+
+    def backward(self):
+        # iterative topological order (tensor graphs are shallow, but stay safe)
+        topo, visited, stack = [], set(), [(self, False)]
+        while stack:
+            v, expanded = stack.pop()
+            if expanded:
+                topo.append(v)
+                continue
+            if id(v) in visited:
+                continue
+            visited.add(id(v))
+            stack.append((v, True))
+            stack.extend((child, False) for child in v._prev)
+
+        self.grad = np.ones_like(self.data)
+        for v in reversed(topo):
+            if v._backward is not None and v._prev:
+                v._backward()
+
+    def __neg__(self):
+        return self * -1.0
+
+    def __radd__(self, other):
+        return self + other
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __rmul__(self, other):
+        return self * other
+
+
+# --- Fused operations ---
+
+def stack(tensors, axis=0):
+    out = Tensor(np.stack([t.data for t in tensors], axis=axis), tuple(tensors), 'stack')
+
+    def _backward():
+        grads = np.moveaxis(out.grad, axis, 0)
+        for t, g in zip(tensors, grads):
+            t.grad += g
+    return _attach(out, _backward)
+
+
+def linear(x, w):
+    """``x @ w.T`` for a weight matrix stored as (nout, nin), like the scalar engine."""
+    out = Tensor(x.data @ w.data.T, (x, w), 'linear')
+
+    def _backward():
+        g = out.grad
+        x.grad += g @ w.data
+        w.grad += g.reshape(-1, g.shape[-1]).T @ x.data.reshape(-1, x.data.shape[-1])
+    return _attach(out, _backward)
+
+
+def softmax(x, axis=-1):
+    shifted = x.data - x.data.max(axis=axis, keepdims=True)
+    e = np.exp(shifted)
+    out = Tensor(e / e.sum(axis=axis, keepdims=True), (x,), 'softmax')
+
+    def _backward():
+        y = out.data
+        x.grad += y * (out.grad - (out.grad * y).sum(axis=axis, keepdims=True))
+    return _attach(out, _backward)
+
+
+def rmsnorm(x, eps=1e-5):
+    scale = (np.mean(x.data * x.data, axis=-1, keepdims=True) + eps) ** -0.5
+    out = Tensor(x.data * scale, (x,), 'rmsnorm')
+
+    def _backward():
+        n = x.data.shape[-1]
+        gx = (out.grad * x.data).sum(axis=-1, keepdims=True)
+        x.grad += scale * out.grad - (scale ** 3) * x.data * gx / n
+    return _attach(out, _backward)
+
+
+def cross_entropy(logits, targets, weights=None):
+    """
+    Negative log-likelihood of ``targets`` under row-wise softmax of ``logits``:
+    the mean over rows, or the ``weights``-weighted sum (zero weight masks a row).
+    """
+    targets = np.asarray(targets)
+    rows = np.arange(len(targets))
+    if weights is None:
+        weights = np.full(len(targets), 1.0 / len(targets))
+    shifted = logits.data - logits.data.max(axis=-1, keepdims=True)
+    log_norm = np.log(np.exp(shifted).sum(axis=-1))
+    loss = weights @ (log_norm - shifted[rows, targets])
+    out = Tensor(loss, (logits,), 'cross_entropy')
+
+    def _backward():
+        grad = np.exp(shifted - log_norm[:, None])
+        grad[rows, targets] -= 1
+        logits.grad += grad * (weights[:, None] * out.grad)
+    return _attach(out, _backward)
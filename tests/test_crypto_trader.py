@@ -186,3 +186,321 @@ class TestGetKoreanReason:
     def test_unknown_code_returns_code_itself(self, engine):
         result = engine.get_korean_reason("SOME_UNKNOWN_CODE")
         assert result == "SOME_UNKNOWN_CODE"
+
+
+# ---------------------------------------------------------------------------
+# Tests: fetch_market_snapshot
+# ---------------------------------------------------------------------------
+
+class TestFetchMarketSnapshot:
+    def _ohlcv(self, n=240):
+        import pandas as pd
+        return pd.DataFrame({"close": [100.0 + i for i in range(n)]})
+
+    def test_fetches_coins_concurrently(self, engine):
+        """Six slow tickers should take about one request's latency, not six."""
+        import time
+
+        def slow_ohlcv(ticker, **kwargs):
+            time.sleep(0.2)
+            return self._ohlcv()
+
+        engine.coins = ["KRW-BTC", "KRW-ETH", "KRW-XRP", "KRW-SOL", "KRW-AVAX", "KRW-DOGE"]
+        engine.fetch_workers = 8
+        engine.get_balance_info = MagicMock(return_value={"krw_balance": 0, "coin_balance": 0})
+        with patch("modules.crypto_trader.engine.pyupbit") as mock_upbit, \
+             patch("modules.crypto_trader.prices.pyupbit") as mock_prices:
+            mock_upbit.get_ohlcv.side_effect = slow_ohlcv
+            mock_prices.get_current_price.return_value = {t: 100.0 for t in engine.coins}
+            t0 = time.perf_counter()
+            snapshot = engine.fetch_market_snapshot()
+        assert time.perf_counter() - t0 < 0.6
+        mock_prices.get_current_price.assert_called_once_with(engine.coins)
+        assert list(snapshot) == engine.coins  # config order
+        assert snapshot["KRW-ETH"]["current_price"] == 100.0
+        assert "rsi" in snapshot["KRW-ETH"]["df"]
+
+    def test_skips_coins_with_failed_or_timed_out_requests(self, engine):
+        """A hung or failing request drops only its coin from the snapshot."""
+        import threading
+        import time
+
+        release = threading.Event()
+
+        def ohlcv(ticker, **kwargs):
+            if ticker == "KRW-ETH":
+                release.wait(5)  # hangs past the timeout
+            if ticker == "KRW-XRP":
+                raise ConnectionError("reset")
+            return self._ohlcv()
+
+        engine.coins = ["KRW-BTC", "KRW-ETH", "KRW-XRP"]
+        engine.fetch_timeout = 0.2
+        engine.get_balance_info = MagicMock(return_value={"krw_balance": 0, "coin_balance": 0})
+        with patch("modules.crypto_trader.engine.pyupbit") as mock_upbit, \
+             patch("modules.crypto_trader.prices.pyupbit") as mock_prices:
+            mock_upbit.get_ohlcv.side_effect = ohlcv
+            mock_prices.get_current_price.return_value = {t: 100.0 for t in engine.coins}
+            t0 = time.perf_counter()
+            snapshot = engine.fetch_market_snapshot()
+        release.set()
+        assert time.perf_counter() - t0 < 1.0
+        assert list(snapshot) == ["KRW-BTC"]
+
+
+# ---------------------------------------------------------------------------
+# Tests: AccountSnapshot
+# ---------------------------------------------------------------------------
+
+class TestAccountSnapshot:
+    BALANCES = [
+        {"currency": "KRW", "balance": "500000", "avg_buy_price": "0"},
+        {"currency": "BTC", "balance": "0.01", "avg_buy_price": "80000000"},
+        {"currency": "ETH", "balance": "0.0001", "avg_buy_price": "4000000"},  # dust
+    ]
+    PRICES = {"KRW-BTC": 100_000_000, "KRW-ETH": 5_000_000}
+
+    def test_snapshot_values_positions_and_balance_info(self):
+        from modules.crypto_trader.account import AccountSnapshot
+        from modules.crypto_trader.prices import PriceService
+
+        upbit = MagicMock()
+        upbit.get_balances.return_value = self.BALANCES
+        with patch("modules.crypto_trader.prices.pyupbit") as mock_upbit:
+            mock_upbit.get_current_price.return_value = self.PRICES
+            account = AccountSnapshot.fetch(upbit, PriceService())
+        mock_upbit.get_current_price.assert_called_once_with(["KRW-BTC", "KRW-ETH"])
+
+        assert account.total_assets == 500_000 + 1_000_000 + 500
+        assert account.held_coin_count() == 1
+        assert account.balance_info("KRW-BTC") == {
+            "krw_balance": 500_000, "coin_balance": 0.01, "avg_buy_price": 80_000_000}
+        assert account.balance_info("KRW-SOL")["coin_balance"] == 0
+        assert account.positions()["BTC"]["return_rate"] == 25.0
+
+        upbit.get_balances.return_value = {"error": {"name": "invalid_access_key"}}
+        with pytest.raises(ValueError):
+            AccountSnapshot.fetch(upbit, PriceService())
+
+    def test_cycle_reads_account_once_and_after_orders(self, engine, tmp_path):
+        """Private balance calls per cycle stay constant in the number of coins."""
+        import pandas as pd
+
+        engine.coins = ["KRW-BTC", "KRW-ETH", "KRW-XRP", "KRW-SOL", "KRW-AVAX", "KRW-DOGE"]
+        engine.upbit = MagicMock()
+        engine.upbit.get_balances.return_value = self.BALANCES
+        engine.order_settle_seconds = 0
+        decisions = {"KRW-XRP": {"action": "BUY", "confidence": 0.9, "position_size_percent": 10}}
+        engine.analyze_market = MagicMock(
+            side_effect=lambda ticker, *args: dict(decisions.get(ticker, {"action": "HOLD", "confidence": 0.5})))
+
+        with patch("modules.crypto_trader.engine.pyupbit") as mock_upbit, \
+             patch("modules.crypto_trader.prices.pyupbit") as mock_prices, \
+             patch("modules.crypto_trader.engine.time.sleep"), \
+             patch("modules.crypto_trader.engine.STATUS_FILE", tmp_path / "status.json"):
+            mock_upbit.get_ohlcv.return_value = pd.DataFrame({"close": [100.0 + i for i in range(240)]})
+            mock_prices.get_current_price.return_value = dict({t: 1000.0 for t in engine.coins}, **self.PRICES)
+            engine.run_cycle()
+
+        # One read for the cycle, one after the BUY; never per coin, and get_balance is not used
+        assert engine.upbit.get_balances.call_count == 2
+        engine.upbit.get_balance.assert_not_called()
+        engine.upbit.buy_market_order.assert_called_once()
+        # Held and watched coins priced in one request; later lookups within the TTL are cache hits
+        mock_prices.get_current_price.assert_called_once()
+        assert engine.prices.stats()["hits"] == 2 * len(engine.coins)
+        status = json.loads((tmp_path / "status.json").read_text(encoding="utf-8"))
+        assert status["total_assets"] == 1_500_500 and set(status["positions"]) == {"KRW", "BTC", "ETH"}
+
+
+# ---------------------------------------------------------------------------
+# Tests: PriceService
+# ---------------------------------------------------------------------------
+
+class TestPriceService:
+    def test_batches_and_caches_until_ttl(self):
+        from modules.crypto_trader.prices import PriceService
+
+        now = [0.0]
+        prices = PriceService(ttl=10, clock=lambda: now[0])
+        with patch("modules.crypto_trader.prices.pyupbit") as mock_upbit:
+            mock_upbit.get_current_price.return_value = {"KRW-BTC": 1.0, "KRW-ETH": 2.0}
+            assert prices.get_prices(["KRW-BTC", "KRW-ETH"]) == {"KRW-BTC": 1.0, "KRW-ETH": 2.0}
+            assert prices.get_price("KRW-ETH") == 2.0
+            mock_upbit.get_current_price.assert_called_once_with(["KRW-BTC", "KRW-ETH"])
+
+            # Only the stale-or-missing markets are requested
+            mock_upbit.get_current_price.return_value = 3.0
+            now[0] = 5.0
+            assert prices.get_prices(["KRW-BTC", "KRW-XRP"]) == {"KRW-BTC": 1.0, "KRW-XRP": 3.0}
+            mock_upbit.get_current_price.assert_called_with(["KRW-XRP"])
+            now[0] = 11.0
+            mock_upbit.get_current_price.return_value = {"KRW-BTC": 4.0, "KRW-ETH": 5.0}
+            assert prices.get_prices(["KRW-BTC", "KRW-ETH", "KRW-XRP"])["KRW-BTC"] == 4.0
+        assert prices.stats() == {"hits": 3, "misses": 5, "requests": 3, "hit_rate": 3 / 8}
+
+    def test_falls_back_to_single_requests_when_batch_fails(self):
+        from modules.crypto_trader.prices import PriceService
+
+        def price(ticker):
+            if isinstance(ticker, list) or ticker == "KRW-GONE":
+                raise ValueError("Code not found")
+            return 7.0
+
+        prices = PriceService()
+        with patch("modules.crypto_trader.prices.pyupbit") as mock_upbit:
+            mock_upbit.get_current_price.side_effect = price
+            assert prices.get_prices(["KRW-BTC", "KRW-GONE"]) == {"KRW-BTC": 7.0}
+        assert prices.requests == 3
+
+
+# ---------------------------------------------------------------------------
+# Tests: CandleStore
+# ---------------------------------------------------------------------------
+
+class FakeCandleSource:
+    """Stands in for pyupbit.get_ohlcv over hourly candles; ``hidden`` slots are withheld once."""
+
+    def __init__(self, hours, no_trades=()):
+        from datetime import datetime, timedelta
+
+        import pandas as pd
+
+        start = datetime(2026, 1, 1)
+        self.index = pd.DatetimeIndex([start + timedelta(hours=h) for h in range(hours)])
+        self.no_trades = {self.index[h] for h in no_trades}
+        self.hidden = set()
+        self.now = self.index[-1]
+        self.calls = []
+
+    def __call__(self, ticker, interval, count, to=None):
+        from datetime import timedelta
+
+        import pandas as pd
+
+        end = self.now if to is None else pd.Timestamp(to) + timedelta(hours=9) - timedelta(seconds=1)
+        self.calls.append((count, to))
+        index = [t for t in self.index if t <= end and t not in self.no_trades][-count:]
+        served = [t for t in index if t not in self.hidden]
+        self.hidden.clear()
+        close = [float(t.hour * 10 + t.day) for t in served]
+        return pd.DataFrame({"open": close, "high": close, "low": close, "close": close,
+                             "volume": [1.0] * len(served), "value": close}, index=pd.DatetimeIndex(served))
+
+
+class TestCandleStore:
+    def test_downloads_only_new_candles(self, tmp_path):
+        import numpy as np
+
+        from modules.crypto_trader.candles import CandleStore
+
+        source = FakeCandleSource(hours=300)
+        source.now = source.index[250]
+        store = CandleStore(tmp_path / "candles.sqlite", fetch=source)
+        df = store.get_ohlcv("KRW-BTC", "minute60", 60, count=240, now=source.now.to_pydatetime())
+        assert len(df) == 240 and df.index[-1] == source.now and store.downloaded == 240
+
+        # An hour later: the last stored (then still forming) candle and the new one
+        source.now = source.index[251]
+        df = store.get_ohlcv("KRW-BTC", "minute60", 60, count=240, now=source.now.to_pydatetime())
+        assert source.calls[-1] == (2, None) and store.downloaded == 242
+        expected = source("KRW-BTC", "minute60", 240)
+        assert (df.index == expected.index).all() and np.array_equal(df.to_numpy(), expected.to_numpy())
+        assert list(df.columns) == ["open", "high", "low", "close", "volume", "value"]
+
+    def test_repairs_gaps_and_remembers_empty_slots(self, tmp_path):
+        from modules.crypto_trader.candles import CandleStore
+
+        source = FakeCandleSource(hours=50, no_trades=[30])
+        source.hidden = {source.index[40], source.index[41]}  # dropped by the first response only
+        store = CandleStore(tmp_path / "candles.sqlite", fetch=source)
+        df = store.get_ohlcv("KRW-BTC", "minute60", 60, count=48, now=source.now.to_pydatetime())
+
+        # Both holes re-requested once, each ending at the candle after it
+        assert source.calls[1:] == [(1, "2026-01-01 22:00:00"), (2, "2026-01-02 09:00:00")]
+        assert (df.index == source("KRW-BTC", "minute60", 48).index).all()  # 48 traded candles, like pyupbit
+        assert source.index[40] in df.index and source.index[30] not in df.index
+        del source.calls[-1]
+
+        # The no-trade slot is not asked for again
+        store.get_ohlcv("KRW-BTC", "minute60", 60, count=48, now=source.now.to_pydatetime())
+        assert source.calls[3:] == [(1, None)]
+
+    def test_failed_download_serves_no_outdated_candles(self, tmp_path):
+        from datetime import timedelta
+
+        from modules.crypto_trader.candles import CandleStore
+
+        source = FakeCandleSource(hours=300)
+        store = CandleStore(tmp_path / "candles.sqlite", fetch=source)
+        assert len(store.get_ohlcv("KRW-BTC", "minute60", 60, count=240, now=source.now.to_pydatetime())) == 240
+
+        # Upbit down: the stored window still covers the current slot, but not the next ones
+        store.fetch = lambda *args, **kwargs: None
+        now = source.now.to_pydatetime()
+        assert len(store.get_ohlcv("KRW-BTC", "minute60", 60, count=240, now=now + timedelta(minutes=30))) == 240
+        assert store.get_ohlcv("KRW-BTC", "minute60", 60, count=240, now=now + timedelta(days=2)) is None
+        assert CandleStore(tmp_path / "empty.sqlite", fetch=store.fetch).get_ohlcv(
+            "KRW-BTC", "minute60", 60, count=240, now=now) is None
+
+
+# ---------------------------------------------------------------------------
+# Tests: IndicatorState
+# ---------------------------------------------------------------------------
+
+class TestIndicatorState:
+    def _assert_matches(self, expected, actual, scale, rows=slice(None)):
+        import numpy as np
+
+        from modules.crypto_trader.indicators import INDICATORS
+
+        for name in INDICATORS:
+            a, b = np.asarray(expected[name], dtype=float)[rows], np.asarray(actual[name], dtype=float)[rows]
+            assert (np.isnan(a) == np.isnan(b)).all(), name
+            # pandas' rolling std drifts by ~1e-8 of the price level; the streaming sums are re-anchored
+            assert np.allclose(a[~np.isnan(a)], b[~np.isnan(b)], rtol=1e-9, atol=scale * 1e-7), name
+
+    def test_matches_pandas_path(self):
+        import json
+
+        import numpy as np
+        import pandas as pd
+
+        from modules.crypto_trader.indicators import IndicatorState, compute_indicators
+
+        rng = np.random.default_rng(0)
+        close = 1e8 * np.exp(np.cumsum(rng.normal(0, 0.01, 1000)))
+        close[300:330] = close[300]  # flat: zero std, undefined RSI
+        close[500:520] = close[500] + np.arange(20) * 1000  # only gains: RSI 100
+        expected = compute_indicators(pd.DataFrame({"close": close}))
+
+        state = IndicatorState()
+        rows = [state.update(c) for c in close[:600]]
+        peeked = state.peek(close[600])
+        assert state.count == 600
+        state = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))  # persisted between cycles
+        rows += [state.update(c) for c in close[600:]]
+        assert rows[600] == peeked
+
+        self._assert_matches(expected, pd.DataFrame(rows), scale=close.max())
+        assert pd.DataFrame(rows)["rsi"].iloc[519] == 100.0
+
+    def test_streams_through_candle_store_across_cycles(self, tmp_path):
+        from modules.crypto_trader.candles import COLUMNS, CandleStore
+        from modules.crypto_trader.indicators import add_streaming_indicators, compute_indicators
+
+        source = FakeCandleSource(hours=300)
+        store = CandleStore(tmp_path / "candles.sqlite", fetch=source)
+        for hour in range(250, 262):
+            source.now = source.index[hour]
+            df = store.get_ohlcv("KRW-BTC", "minute60", 60, count=240, now=source.now.to_pydatetime())
+            expected = compute_indicators(df[list(COLUMNS)].copy())
+            df = add_streaming_indicators(df, store, "KRW-BTC", "minute60")
+            # Later frames start later, but the state remembers older candles: its early rows are
+            # warmed up (pandas: NaN, EMA re-seeded) and agree once the EMA seed has decayed
+            rows = slice(None) if hour == 250 else slice(-24, None)
+            self._assert_matches(expected, df, scale=df["close"].max(), rows=rows)
+
+        # One committed candle per hourly cycle, the forming one only peeked
+        ts, state = store.load_indicator_state("KRW-BTC", "minute60")
+        assert state.count == 239 + 11 and ts == int(source.index[260].timestamp())
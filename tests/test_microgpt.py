@@ -12,6 +12,15 @@ import pytest
 def test_env(monkeypatch):
     monkeypatch.setenv("COMMITKIM_ENV", "test")
 
+@pytest.fixture
+def microgpt_root(tmp_path):
+    """``tmp_path`` as the project root, with a three-name corpus; yields ``data/microgpt``."""
+    data_dir = tmp_path / "data" / "microgpt"
+    data_dir.mkdir(parents=True)
+    (data_dir / "input.txt").write_text("emma\nava\nmia\n", encoding="utf-8")
+    with patch("modules.microgpt.engine.PROJECT_ROOT", tmp_path):
+        yield data_dir
+
 def test_value_addition_backward():
     from modules.microgpt.engine import Value
     a = Value(2.0)
@@ -53,3 +62,582 @@ def test_microgpt_visualizer_run(tmp_path):
         assert "final_loss" in trace
         assert "loss_history" in trace
         assert "samples" in trace
+
+def test_tensor_cross_entropy_matches_scalar():
+    from modules.microgpt.engine import MicroGPTVisualizer, Value
+    from modules.microgpt.tensor import Tensor, cross_entropy
+
+    raw = [0.5, -1.0, 2.0]
+    logits = [Value(x) for x in raw]
+    probs = MicroGPTVisualizer.softmax(None, logits)
+    loss = -probs[2].log()
+    loss.backward()
+
+    t = Tensor([raw])
+    t_loss = cross_entropy(t, [2])
+    t_loss.backward()
+
+    assert t_loss.data == pytest.approx(loss.data)
+    assert t.grad[0].tolist() == pytest.approx([v.grad for v in logits])
+
+def test_numpy_backend_matches_scalar_losses(microgpt_root):
+    from modules.microgpt.engine import MicroGPTVisualizer
+
+    traces = {}
+    for backend in ("scalar", "numpy"):
+        viz = MicroGPTVisualizer(backend=backend)
+        viz.num_steps = 3
+        traces[backend] = viz.run()
+
+    scalar, tensor = traces["scalar"], traces["numpy"]
+    assert set(tensor) == set(scalar)
+    assert [h["loss"] for h in tensor["loss_history"]] == pytest.approx(
+        [h["loss"] for h in scalar["loss_history"]], rel=1e-9)
+    assert tensor["params"]["backend"] == "numpy"
+    assert tensor["graph"]["op"]
+
+def test_value_nodes_are_compact_and_constants_shared():
+    import tracemalloc
+
+    from modules.microgpt.engine import Value, const
+
+    class LegacyValue:
+        """Node layout before slots: __dict__, child set, label and a closure."""
+        def __init__(self, data, _children=(), _op='', label=''):
+            self.data = data
+            self.grad = 0
+            self._children = set(_children)
+            self._op = _op
+            self.label = label
+
+        def __mul__(self, other):
+            other = other if isinstance(other, LegacyValue) else LegacyValue(other)
+            out = LegacyValue(self.data * other.data, (self, other), '*')
+
+            def _backward():
+                self.grad += other.data * out.grad
+                other.grad += self.data * out.grad
+            out._backward = _backward
+            return out
+
+    def peak_bytes(cls, n=5000):
+        tracemalloc.start()
+        x = cls(1.0)
+        nodes = [x * 0.5 for _ in range(n)]
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert len(nodes) == n
+        return peak / n
+
+    before, after = peak_bytes(LegacyValue), peak_bytes(Value)
+    print(f"bytes per '*' node: before={before:.0f} after={after:.0f}")
+    assert not hasattr(Value(1.0), '__dict__')
+    assert after < before / 3
+    assert const(0.5) is const(0.5)
+    assert (Value(2.0) * 0.5)._prev[1] is const(0.5)
+
+def test_backward_handles_deep_graphs_and_tape_replay():
+    import sys
+
+    from modules.microgpt.engine import Tape, Value
+
+    depth = sys.getrecursionlimit() * 5
+    x = Value(1.0)
+    y = x
+    for _ in range(depth):
+        y = y * 1.0001 + x
+    y.backward()
+    expected = x.grad
+
+    x.grad = 0
+    with Tape() as tape:
+        y = x
+        for _ in range(depth):
+            y = y * 1.0001 + x
+    tape.backward(y)
+
+    assert len(tape.nodes) == 2 * depth
+    assert x.grad == pytest.approx(expected)
+
+def test_compiled_loss_matches_scalar_graph(microgpt_root):
+    from modules.microgpt.compiler import compile_loss
+    from modules.microgpt.engine import MicroGPTVisualizer, Tape
+
+    viz = MicroGPTVisualizer()
+    viz.n_embd, viz.n_head, viz.head_dim = 8, 2, 4
+    viz._init_model()
+
+    tokens = [viz.BOS, viz.stoi["e"], viz.stoi["m"], viz.stoi["m"], viz.stoi["a"], viz.BOS]
+    fn = compile_loss(viz, 5)
+    assert compile_loss(viz, 7) is fn  # same length bucket; the padded tail is masked out of the loss
+    assert "max((" in fn.source  # stabilised softmax
+
+    # Large weights: target probabilities underflow to 0.0, which the log-sum-exp loss survives
+    for scale in (1.0, 200.0):
+        for p in viz.params:
+            p.data *= scale
+        loss, grads = fn([p.data for p in viz.params], tokens)
+
+        viz.zero_grad()
+        with Tape() as tape:
+            expected = viz._doc_loss(tokens, 5)
+        tape.backward(expected)
+
+        assert loss == pytest.approx(expected.data, rel=1e-12)
+        assert grads == pytest.approx([p.grad for p in viz.params], rel=1e-9, abs=1e-12)
+    assert expected.data > 750  # exp(-loss) is below the smallest float
+
+def test_graph_store_matches_value_engine(microgpt_root):
+    from modules.microgpt.engine import MicroGPTVisualizer
+
+    tokens = None
+    results = {}
+    for backend in ("scalar", "soa"):
+        viz = MicroGPTVisualizer(backend=backend)
+        tokens = [viz.BOS] + [viz.stoi[ch] for ch in "emma"] + [viz.BOS]
+        loss = viz._forward_backward(tokens, 5)
+        results[backend] = (loss.data, [p.grad for p in viz.params])
+
+    assert results["soa"][0] == pytest.approx(results["scalar"][0], rel=1e-12)
+    assert results["soa"][1] == pytest.approx(results["scalar"][1], rel=1e-9, abs=1e-12)
+
+    graph = viz.graph
+    edge_bytes = graph.parents.itemsize * len(graph.parents)
+    assert (graph.nbytes - edge_bytes) / len(graph) < 32
+    assert viz.export_graph(loss)["op"]
+
+def test_fused_ops_match_primitive_graph_with_fewer_nodes(microgpt_root):
+    from modules.microgpt.engine import MicroGPTVisualizer, Tape
+
+    viz = MicroGPTVisualizer()
+    tokens = [viz.BOS] + [viz.stoi[ch] for ch in "emma"] + [viz.BOS]
+
+    results = {}
+    for fused in (False, True):
+        viz.fused_ops = fused
+        viz.zero_grad()
+        with Tape() as tape:
+            loss = viz._doc_loss(tokens, 5)
+        tape.backward(loss)
+        results[fused] = (len(tape.nodes), loss.data, [p.grad for p in viz.params])
+
+    assert results[True][0] * 10 < results[False][0]
+    assert results[True][1] == pytest.approx(results[False][1], rel=1e-12)
+    assert results[True][2] == pytest.approx(results[False][2], rel=1e-8, abs=1e-12)
+
+def test_forward_sequence_matches_incremental_gpt(microgpt_root):
+    from modules.microgpt.engine import MicroGPTVisualizer
+
+    for backend in ("scalar", "numpy"):
+        viz = MicroGPTVisualizer(backend=backend)
+        tokens = [viz.BOS, 0, 1, 2, viz.BOS]
+        n = len(tokens) - 1
+        keys, values = [[] for _ in range(viz.n_layer)], [[] for _ in range(viz.n_layer)]
+        incremental = [viz.gpt(tokens[pos], pos, keys, values) for pos in range(n)]
+        sequence = viz.forward_sequence(tokens, n)
+
+        if backend == "numpy":
+            assert sequence.shape == (n, viz.vocab_size)
+            expected = [row.data.tolist() for row in incremental]
+            got = sequence.data.tolist()
+        else:
+            expected = [[x.data for x in row] for row in incremental]
+            got = [[x.data for x in row] for row in sequence]
+        for got_row, expected_row in zip(got, expected, strict=True):
+            assert got_row == pytest.approx(expected_row, rel=1e-9)
+
+def test_minibatch_and_grad_accumulation(microgpt_root):
+    from modules.microgpt.engine import MicroGPTVisualizer
+
+    (microgpt_root / "input.txt").write_text(
+        "emma\nava\nmia\nolivia\nsophia\nisabella\n", encoding="utf-8")
+
+    def losses(backend, batch_size, grad_accum_steps):
+        viz = MicroGPTVisualizer(backend=backend)
+        viz.num_steps = 2
+        viz.pack_sequences = False
+        viz.batch_size, viz.grad_accum_steps = batch_size, grad_accum_steps
+        history = viz.run()["loss_history"]
+        assert all(h["tokens"] > 0 and h["tokens_per_sec"] > 0 for h in history)
+        return [h["loss"] for h in history]
+
+    # Padded NumPy batches agree with per-document scalar graphs
+    assert losses("numpy", 3, 2) == pytest.approx(losses("scalar", 3, 2), rel=1e-9)
+    # Accumulating micro-batches averages to the same gradient as one big batch
+    assert losses("numpy", 1, 4) == pytest.approx(losses("numpy", 4, 1), rel=1e-9)
+
+def test_packed_windows_reset_attention_at_document_boundaries(microgpt_root):
+    from modules.microgpt.engine import MicroGPTVisualizer
+    from modules.microgpt.loader import DocumentLoader
+
+    (microgpt_root / "input.txt").write_text(
+        "emma\nava\nmia\nolivia\nsophia\nisabella\n", encoding="utf-8")
+
+    viz = MicroGPTVisualizer(backend="numpy")
+
+    loader = DocumentLoader(len(viz.docs), viz._doc_tokens, viz.block_size, batch_size=2, prefetch=1)
+    batches = iter(loader)
+    batch = next(batches)
+    assert next(batches) != batch  # the stream moves on through the corpus
+    loader.close()
+
+    assert all(sum(n for _, n in window) <= viz.block_size for window in batch)
+    assert sum(len(window) for window in batch) > len(batch)
+
+    # One packed row computes exactly the per-document losses
+    packed = float(viz._batch_loss(batch).data)
+    scalar_viz = MicroGPTVisualizer(backend="scalar")
+    assert packed == pytest.approx(float(scalar_viz._batch_loss(batch).data), rel=1e-9)
+
+    # A failing producer neither blocks close() nor hides its error from the consumer
+    def broken_tokens(i):
+        if i >= 2:
+            raise ValueError("bad document")
+        return viz._doc_tokens(i)
+
+    loader = DocumentLoader(len(viz.docs), broken_tokens, viz.block_size, pack=False, prefetch=1)
+    batches = iter(loader)
+    loader._thread.join(timeout=0.3)
+    assert loader._thread.is_alive()  # error waiting behind the unread batch
+    loader.close()
+    assert loader._thread is None
+
+    batches = iter(loader)
+    next(batches)
+    with pytest.raises(ValueError, match="bad document"):
+        next(batches)
+    loader.close()
+
+def test_token_dataset_cache_is_keyed_by_input_hash(tmp_path):
+    from modules.microgpt.dataset import TokenDataset
+
+    input_file = tmp_path / "input.txt"
+    cache_dir = tmp_path / "cache"
+    input_file.write_text("emma\nava\n\nmia\n", encoding="utf-8")
+
+    cold = TokenDataset.load(input_file, cache_dir)
+    with patch.object(TokenDataset, "build", side_effect=AssertionError("rebuilt")):
+        warm = TokenDataset.load(input_file, cache_dir)
+    assert len(warm) == 3
+    assert sorted(warm) == ["ava", "emma", "mia"]
+    assert [warm.tokens(i) for i in range(len(warm))] == [cold.tokens(i) for i in range(len(cold))]
+    assert warm.tokens(0) == [warm.uchars.index(ch) for ch in warm[0]]
+    assert warm.rng_state == cold.rng_state
+    warm.close()
+
+    # New contents, new cache entry; vocabularies past 255 chars use uint16 tokens
+    input_file.write_text("\n".join(chr(0x4E00 + i) * 2 for i in range(300)), encoding="utf-8")
+    wide = TokenDataset.load(input_file, cache_dir)
+    assert len(wide) == 300 and len(wide.uchars) == 300
+    assert max(max(wide.tokens(i)) for i in range(len(wide))) == 299
+    assert len(list(cache_dir.glob("*.tokens"))) == 2
+
+def test_flat_buffer_adam_and_zero_copy_views(microgpt_root):
+    import numpy as np
+
+    from modules.microgpt.engine import MicroGPTVisualizer
+    from modules.microgpt.optim import Adam
+
+    # Vectorized step matches the per-parameter reference update
+    data, grad = np.array([0.5, -1.0, 2.0]), np.array([0.1, -0.2, 0.0])
+    ref = data.tolist()
+    opt = Adam(data, grad)
+    opt.step(0.01, grad_scale=0.5)
+    for i, g in enumerate(grad.tolist()):
+        g *= 0.5
+        m_hat = (1 - 0.85) * g / (1 - 0.85)
+        v_hat = (1 - 0.99) * g ** 2 / (1 - 0.99)
+        ref[i] -= 0.01 * m_hat / (v_hat ** 0.5 + 1e-8)
+    assert data.tolist() == pytest.approx(ref, rel=1e-12)
+
+    # AdamW also shrinks weights that get no gradient
+    data = np.array([1.0])
+    Adam(data, np.zeros(1), weight_decay=0.1).step(0.01)
+    assert data[0] == pytest.approx(1.0 - 0.01 * 0.1)
+
+    viz = MicroGPTVisualizer(backend="numpy")
+
+    wte = viz.state_dict["wte"]
+    assert np.shares_memory(wte.data, viz.flat_data) and np.shares_memory(wte.grad, viz.flat_grad)
+    assert viz.flat_data.size == sum(p.data.size for p in viz.params)
+    viz._forward_backward([viz.BOS, 0, 1, viz.BOS], 3)
+    assert viz.flat_grad.any()
+    viz.zero_grad()
+    assert not viz.flat_grad.any() and np.shares_memory(wte.grad, viz.flat_grad)
+
+def test_lazy_adam_updates_only_touched_rows(microgpt_root):
+    import numpy as np
+
+    from modules.microgpt.engine import MicroGPTVisualizer
+    from modules.microgpt.optim import Adam
+
+    init = np.arange(1.0, 7.0)  # 3x2 table
+    data, grad = init.copy(), np.zeros(6)
+    opt = Adam(data, grad, sparse={'wte': (0, 3, 2)})
+    grad[:] = [0.1, 0.2, 0, 0, 0, 0]
+    opt.step(0.01, rows={'wte': [0]})
+    grad[:] = [0.3, -0.1, 0, 0, 0.5, 0.5]
+    opt.step(0.01)  # rows found from the non-zero gradient
+    assert opt.row_steps['wte'].tolist() == [2, 0, 1]
+
+    # Each row matches a dense Adam that only ever saw that row's updates
+    row0, g0 = init[:2].copy(), np.zeros(2)
+    dense = Adam(row0, g0)
+    for g in ([0.1, 0.2], [0.3, -0.1]):
+        g0[:] = g
+        dense.step(0.01)
+    row2, g2 = init[4:].copy(), np.array([0.5, 0.5])
+    Adam(row2, g2).step(0.01)
+    assert data[:2].tolist() == pytest.approx(row0.tolist(), rel=1e-12)
+    assert data[2:4].tolist() == init[2:4].tolist() and not opt.m[2:4].any()
+    assert data[4:].tolist() == pytest.approx(row2.tolist(), rel=1e-12)
+
+    viz = MicroGPTVisualizer(backend="numpy")
+    viz.sparse_embeddings = True
+    viz._init_model()
+    viz.num_steps = 2
+    before = viz.state_dict["wte"].data.copy()
+    trace = viz.run()
+    changed = np.flatnonzero((viz.state_dict["wte"].data != before).any(axis=1))
+    assert set(changed) == set(np.flatnonzero(viz.optimizer.row_steps['wte']))
+    assert trace["params"]["sparse_embeddings"] is True
+
+def test_no_grad_inference_matches_training_forward(microgpt_root):
+    import numpy as np
+
+    from modules.microgpt.engine import MicroGPTVisualizer, Tape, Value, no_grad
+    from modules.microgpt.inference import KVCache, forward_token
+    from modules.microgpt.tensor import Tensor
+
+    with no_grad(), Tape() as tape:
+        a = Value(2.0)
+        b = (a * 3 + 1).relu()
+        t = Tensor([1.0, 2.0]) * 2.0
+    assert b.data == 7.0 and b._prev == () and not tape.nodes
+    assert t._prev == () and t._backward is None  # no closure holding the operands
+
+    viz = MicroGPTVisualizer()
+
+    tokens = [viz.BOS, 0, 1, 2]
+    keys, values = [[] for _ in range(viz.n_layer)], [[] for _ in range(viz.n_layer)]
+    cache = KVCache.for_model(viz)
+    keys_buffer = cache.keys
+    for pos, token in enumerate(tokens):
+        expected = [x.data for x in viz.gpt(token, pos, keys, values)]
+        got = forward_token(viz, token, pos, cache)
+        assert got.tolist() == pytest.approx(expected, rel=1e-9)
+    assert cache.keys is keys_buffer and np.shares_memory(viz.weights["wte"], viz.flat_data)
+
+def test_batched_sampler_with_top_k_and_top_p(microgpt_root):
+    import numpy as np
+
+    from modules.microgpt.engine import MicroGPTVisualizer
+    from modules.microgpt.inference import KVCache, forward_token, forward_tokens, next_token_probs, sample
+
+    logits = np.array([[1.0, 3.0, 2.0, 0.0]])
+    assert np.flatnonzero(next_token_probs(logits, top_k=2)[0]).tolist() == [1, 2]
+    probs = next_token_probs(logits, top_p=0.7)[0]  # 0.64 + 0.24 reaches 0.7
+    assert np.flatnonzero(probs).tolist() == [1, 2] and probs.sum() == pytest.approx(1.0)
+
+    viz = MicroGPTVisualizer()
+
+    # Each row of a batched step is the single-sequence forward
+    batch_cache, single_cache = KVCache.for_model(viz, 3), KVCache.for_model(viz)
+    for pos, tokens in enumerate([[viz.BOS] * 3, [0, 1, 2]]):
+        batched = forward_tokens(viz, tokens, pos, batch_cache)
+    for pos, token in enumerate([viz.BOS, 2]):
+        single = forward_token(viz, token, pos, single_cache)
+    assert batched[2].tolist() == pytest.approx(single.tolist(), rel=1e-9)
+
+    seqs = sample(viz, 200, temperature=0.8, top_k=5, rng=np.random.default_rng(0))
+    assert len(seqs) == 200 and all(len(s) <= viz.block_size for s in seqs)
+    assert all(viz.BOS not in s for s in seqs) and len({tuple(s) for s in seqs}) > 1
+
+    # top_k=1 is greedy: every sequence is the same
+    greedy = sample(viz, 4, top_k=1, rng=np.random.default_rng(1))
+    assert all(s == greedy[0] for s in greedy)
+
+def test_checkpoint_save_and_resume(microgpt_root):
+    import numpy as np
+
+    from modules.microgpt.engine import MicroGPTVisualizer
+
+    first = MicroGPTVisualizer(backend="numpy")
+    first.num_steps = 2
+    first.run()
+    assert not first.checkpoint_file.exists()  # plain runs leave the resumable checkpoint alone
+    first.save_checkpoint()
+
+    for backend in ("numpy", "scalar"):
+        resumed = MicroGPTVisualizer(backend=backend)
+        assert resumed.load_checkpoint()
+        assert np.array_equal(resumed.flat_data, first.flat_data)
+        assert np.array_equal(resumed.optimizer.v, first.optimizer.v)
+        assert resumed.optimizer.t == 2 and resumed.next_doc == first.next_doc
+    assert resumed.params[0].data == first.flat_data[0]  # scattered into the Value nodes
+
+    resumed = MicroGPTVisualizer(backend="numpy")
+    resumed.num_steps, resumed.resume = 1, True
+    trace = resumed.run()
+    assert trace["params"]["start_step"] == 2
+    assert [h["step"] for h in trace["loss_history"]] == [3]
+
+    # A checkpoint for another model shape is ignored, not half-loaded
+    other = MicroGPTVisualizer(backend="numpy")
+    other.n_embd = 8
+    other.head_dim = other.n_embd // other.n_head
+    other._init_model()
+    before = other.flat_data.copy()
+    assert not other.load_checkpoint()
+    assert np.array_equal(other.flat_data, before)
+
+def test_config_hyperparameters_and_parallel_sweep(microgpt_root):
+    from core.config import Config
+    from modules.microgpt.engine import MicroGPTVisualizer
+    from modules.microgpt.sweep import expand_grid, run_sweep
+
+    data_dir = microgpt_root
+
+    shape = {"n_layer": 2, "n_embd": 8, "n_head": 2, "block_size": 8}
+    with patch.object(Config.instance(), "get", return_value=shape):
+        viz = MicroGPTVisualizer(backend="numpy", data_dir=data_dir)
+    assert (viz.n_layer, viz.n_embd, viz.head_dim, viz.block_size) == (2, 8, 4, 8)
+    assert viz.state_dict["wpe"].shape == (8, 8)
+    with pytest.raises(ValueError):
+        MicroGPTVisualizer(params={"n_embed": 8}, data_dir=data_dir)
+
+    grid = {"n_embd": [8, 16], "learning_rate": [0.01]}
+    assert expand_grid(grid) == [{"learning_rate": 0.01, "n_embd": 8}, {"learning_rate": 0.01, "n_embd": 16}]
+
+    trace = run_sweep(grid, workers=2, seed=7, base_params={"num_steps": 2}, data_dir=data_dir)
+    assert [r["seed"] for r in trace["runs"]] == [7, 8]
+    assert [r["params"]["n_embd"] for r in trace["runs"]] == [8, 16]
+    assert all(r["tokens_per_sec"] > 0 and len(r["loss_history"]) == 2 for r in trace["runs"])
+    assert (data_dir / "sweep.json").exists() and not (data_dir / "trace.json").exists()
+
+    # Same seed, same result, whichever process trains it
+    again = MicroGPTVisualizer(backend="numpy", params={"num_steps": 2, "n_embd": 16, "learning_rate": 0.01},
+                               seed=8, data_dir=data_dir, write_files=False)
+    assert again.run()["final_loss"] == pytest.approx(trace["runs"][1]["final_loss"], rel=1e-12)
+
+def test_time_budgeted_training_and_graceful_sigterm(microgpt_root):
+    import json
+    import os
+    import signal
+    import threading
+    import time
+
+    from modules.microgpt.budget import TrainingBudget
+    from modules.microgpt.engine import MicroGPTVisualizer
+
+    budget = TrainingBudget(max_steps=4)
+    while budget.should_continue():
+        assert budget.progress() == budget.steps / 4
+        budget.record_step(0.5, 0.5)
+    assert budget.steps == 4 and budget.stop_reason == "steps" and budget.eta() == 0.0
+
+    # A budget spent before the first step still writes a valid (strict) JSON trace
+    viz = MicroGPTVisualizer(backend="numpy", params={"time_budget": 0.0})
+    trace = viz.run()
+    assert trace["params"]["steps"] == 0 and trace["final_loss"] is None
+    saved = json.loads(viz.trace_file.read_text(encoding="utf-8"), parse_constant=pytest.fail)
+    assert saved["final_loss"] is None
+
+    viz = MicroGPTVisualizer(backend="numpy", params={"time_budget": 0.3})
+    t0 = time.perf_counter()
+    trace = viz.run()
+    assert trace["params"]["stop_reason"] == "wall_time"
+    assert trace["params"]["steps"] == len(trace["loss_history"]) > viz.num_steps  # not capped at 50
+    assert trace["params"]["train_time"] <= 0.3 * 1.2  # stops when the mean next step would not fit
+    assert time.perf_counter() - t0 < 5
+    assert all(h["step_time"] > 0 for h in trace["loss_history"])
+
+    # SIGTERM ends training after the current step; the run still checkpoints and samples
+    viz = MicroGPTVisualizer(backend="numpy", params={"num_steps": 10**6})
+    viz.write_checkpoint = True
+    threading.Timer(0.2, os.kill, (os.getpid(), signal.SIGTERM)).start()
+    trace = viz.run()
+    assert trace["params"]["stop_reason"] == "signal"
+    assert 0 < trace["params"]["steps"] < 10**6
+    assert viz.checkpoint_file.exists() and len(trace["samples"]) == viz.num_samples
+    assert signal.getsignal(signal.SIGTERM) is signal.SIG_DFL
+
+def test_graph_export_is_bounded_columnar_and_dedups_constants(microgpt_root):
+    import json
+    import time
+
+    from modules.microgpt.engine import MicroGPTVisualizer, Value
+
+    viz = MicroGPTVisualizer()
+
+    # A deep chain: only the budget nearest the root is visited
+    x = viz.params[0]
+    for _ in range(50_000):
+        x = x * 1.0001 + Value(0.5)
+    t0 = time.perf_counter()
+    graph = viz.export_graph(x, max_nodes=100)
+    assert time.perf_counter() - t0 < 0.1
+    assert len(graph["op"]) == len(graph["data"]) == len(graph["grad"]) == 100
+    assert graph["truncated"] and graph["ops"][graph["op"][0]] == "+"
+    assert len(graph["src"]) == len(graph["dst"]) and max(graph["src"]) < 100
+
+    # Every Value(0.5) leaf is exported once; the parameter leaf is kept apart
+    y = viz.params[0] * 1.0 + Value(0.5) + Value(0.5) + Value(0.5)
+    graph = viz.export_graph(y)
+    consts = [i for i, (op, v) in enumerate(zip(graph["op"], graph["data"])) if graph["ops"][op] == "" and v == 0.5]
+    assert len(consts) == 1 and not graph["truncated"] and sum(graph["param"]) == 1
+
+    viz.num_steps = 1
+    viz.run()
+    trace = json.loads(viz.trace_file.read_text(encoding="utf-8"))
+    assert len(trace["graph"]["op"]) <= viz.graph_node_budget
+    assert viz.trace_file.stat().st_size < 50_000
+
+def test_opt_in_profiler_reports_phases_and_graph_sizes(microgpt_root):
+    import json
+
+    from modules.microgpt.engine import MicroGPTVisualizer
+
+    viz = MicroGPTVisualizer()
+    viz.num_steps = 2
+    assert "profile" not in viz.run() and not viz.profile_file.exists()
+
+    for backend in ("scalar", "numpy"):
+        viz = MicroGPTVisualizer(backend=backend)
+        viz.num_steps, viz.profile = 2, True
+        viz.run()
+        profile = json.loads(viz.trace_file.read_text(encoding="utf-8"))["profile"]
+        assert profile["steps"] == 2
+        assert {"train;forward", "train;backward", "train;optimizer", "sample"} <= set(profile["phases"])
+        assert sum(profile["op_counts"].values()) == profile["nodes_per_step"] * 2
+        assert 0 < profile["peak_graph_nodes"] <= profile["nodes_per_step"]
+        stacks = [line.rsplit(" ", 1) for line in viz.profile_file.read_text(encoding="utf-8").splitlines()]
+        assert stacks and all(s.startswith("microgpt;") and int(v) >= 0 for s, v in stacks)
+    assert "cross_entropy" in profile["op_counts"]
+
+def test_benchmark_history_and_regression_threshold(microgpt_root):
+    import json
+
+    from modules.microgpt.bench import find_regressions, run_benchmark
+
+    sizes = [{"n_embd": 8, "n_layer": 1, "block_size": 8}, {"n_embd": 16, "n_layer": 1, "block_size": 8},
+             {"n_embd": 8, "n_layer": 1, "block_size": 4, "backends": ["compiled"]}]
+    run = run_benchmark(sizes, backends=["scalar", "numpy", "compiled"], steps=2, warmup=1, data_dir=microgpt_root)
+    assert len(run["results"]) == 7 and run["regressions"] == []
+    for r in run["results"]:
+        assert r["steps"] == 2 and r["steps_per_sec"] > 0 and r["tokens_per_sec"] > 0
+        assert r["nodes_per_step"] > 0 and r["peak_rss_mb"] > 0 and r["train_mem_mb"] >= 0
+        assert (r["compile_sec"] is not None) == (r["backend"] == "compiled")  # compiling is timed on its own
+    scalar = [r for r in run["results"] if r["backend"] == "scalar"]
+    assert 0 < scalar[0]["nodes_per_step"] < scalar[1]["nodes_per_step"]
+
+    # Each run is appended; the next one is compared against it
+    run_benchmark(sizes[:1], backends=["numpy"], steps=1, warmup=0, threshold=10, data_dir=microgpt_root)
+    history = json.loads((microgpt_root / "bench.json").read_text(encoding="utf-8"))
+    assert len(history) == 2 and history[1]["regressions"] == []
+
+    base = dict(run["results"][0])
+    slower = dict(base, steps_per_sec=base["steps_per_sec"] * 0.8)
+    assert find_regressions([slower], [base], threshold=0.1)[0]["change"] < -0.19
+    assert find_regressions([slower], [base], threshold=0.25) == []
+    assert find_regressions([dict(slower, n_embd=64)], [base], threshold=0.1) == []